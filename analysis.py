@@ -0,0 +1,95 @@
+import numpy as np
+
+from circuit import dt
+
+# Glitch metrics of traces of shape (..., imax), all computed along the
+# last axis for every trace at once. Times are in the unit of dt.
+# A crossing is a step where the logical level (above threshold or not)
+# differs from the one of the previous step.
+
+def crossings(traces, threshold=0.5):
+    high = traces > threshold
+    return high[..., 1:] != high[..., :-1]
+
+# Number of threshold crossings
+def count_crossings(traces, threshold=0.5):
+    return crossings(traces, threshold).sum(axis=-1)
+
+def peak(traces):
+    return traces.max(axis=-1)
+
+# How far the trace goes above its final value
+def overshoot(traces):
+    return np.maximum(peak(traces) - traces[..., -1], 0)
+
+# Time after which the trace stays within tol of its final value
+def settling_time(traces, tol=0.05):
+    out = np.abs(traces - traces[..., -1:]) > tol
+    # index of the last step outside the band, -1 when there is none
+    last = traces.shape[-1] - 1 - np.argmax(out[..., ::-1], axis=-1)
+    return np.where(out.any(axis=-1), last + 1, 0) * dt
+
+# Width of the narrowest pulse, i.e. the shortest time between two
+# successive crossings (nan when there are less than two crossings)
+def glitch_width(traces, threshold=0.5):
+    cross = crossings(traces, threshold)
+    idx = np.arange(cross.shape[-1])
+    # index of the last crossing up to each step
+    last = np.maximum.accumulate(np.where(cross, idx, -1), axis=-1)
+    prev = np.concatenate([np.full(last.shape[:-1] + (1,), -1), last[..., :-1]], axis=-1)
+    gaps = np.where(cross & (prev >= 0), idx - prev, np.iinfo(int).max)
+    width = gaps.min(axis=-1)
+    return np.where(width < np.iinfo(int).max, width * dt, np.nan)
+
+# Time from the first crossing of reference (such as an input, of a
+# shape that broadcasts with traces) to the next crossing of the trace
+# (nan when either never crosses)
+def propagation_delay(traces, reference, threshold=0.5):
+    ref = crossings(reference, threshold)
+    start = np.where(ref.any(axis=-1), np.argmax(ref, axis=-1), -1)[..., np.newaxis]
+    cross = crossings(traces, threshold)
+    after = cross & (np.arange(cross.shape[-1]) >= start) & (start >= 0)
+    delay = np.argmax(after, axis=-1) - start[..., 0]
+    return np.where(after.any(axis=-1), delay * dt, np.nan)
+
+# All metrics of traces of shape (..., imax), as a dict of arrays of
+# shape (...); propagation delays are computed when reference is given
+def metrics(traces, threshold=0.5, tol=0.05, reference=None):
+    res = {
+        'peak': peak(traces),
+        'overshoot': overshoot(traces),
+        'settling_time': settling_time(traces, tol),
+        'crossings': count_crossings(traces, threshold),
+        'glitch_width': glitch_width(traces, threshold),
+    }
+    if reference is not None:
+        res['propagation_delay'] = propagation_delay(traces, reference, threshold)
+    return res
+
+# Table with one row per variant and node: the columns are the
+# parameters of the variant, the name of the node and its metrics
+# - traces: array of shape (n_variants, len(names), imax)
+# - params: dict of arrays with one value per variant (e.g. Sweep.params)
+# - reference: name of the node that delays are measured from
+# - only: names of the nodes to include, all of them by default
+def table(traces, names, params=None, reference=None, only=None, **options):
+    params = params or {}
+    rows = [i for (i, n) in enumerate(names) if only is None or n in only]
+    ref = None
+    if reference is not None:
+        ref = traces[:, names.index(reference)][:, np.newaxis]
+    cols = metrics(traces[:, rows], reference=ref, **options)
+    nv = len(traces)
+    res = { k: np.repeat(np.asarray(v), len(rows)) for (k, v) in params.items() }
+    res['node'] = np.tile(np.array([names[i] for i in rows]), nv)
+    for (k, v) in cols.items():
+        res[k] = v.reshape(-1)
+    return res
+
+# Glitch table of a sweep.Sweep
+def sweep_table(sweep, **options):
+    return table(sweep.traces, sweep.names, sweep.params, **options)
+
+# Glitch table of the nodes kept by a circuit that has been run
+def circuit_table(circuit, **options):
+    return table(circuit.state[np.newaxis], [n.name for n in circuit.kept], **options)
@@ -0,0 +1,180 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from circuit import Combinator, Input, data
+from engine import Engine
+
+# Choice of the parts of a library that drive the gates of a circuit
+#
+# Every combination of the inputs (0 or high, held constant) is simulated
+# for imax steps. A gate is scored by the separation of its logical levels
+#   log10(min output when on / max output when off)
+# where on and off follow Combinator.logic. For the outputs of the circuit
+# the off level is the peak over the whole transient, so that glitches
+# count against the assignment. An assignment scores the minimum over its
+# gates, a part is used by at most one gate.
+#
+# The gates are assigned one at a time in topological order (beam search):
+# - a gate only depends on the gates upstream of it, its score is
+#   memoized by the parts of those gates
+# - partial assignments whose score falls below min_score (e.g. 0 for
+#   gates that do not separate their levels) are pruned and
+#   only the best beam ones are extended (beam=None keeps them all,
+#   which is an exhaustive search)
+# - candidates are simulated together as one batch, chunk at a time, in
+#   workers processes
+
+# Gates whose response goes through their cutoff, which can be given a part
+def assignable(engine):
+    return [j for (j, g) in enumerate(engine.gates) if type(g.combinator).response is Combinator.response]
+
+# Every combination of Boolean inputs, shape (2^n_inputs, n_inputs)
+def combinations(n_inputs):
+    return np.array(list(itertools.product([False, True], repeat=n_inputs)), dtype=bool)
+
+# Boolean value of every gate for every combination, shape (len(combos), len(gates))
+def truth(engine, combos):
+    ni = len(engine.inputs)
+    bits = np.empty((len(combos), len(engine.nodes)), dtype=bool)
+    bits[:, :ni] = combos
+    for (j, g) in enumerate(engine.gates):
+        bits[:, ni + j] = g.combinator.logic(*[bits[:, engine.row[id(i)]] for i in g.inputs])
+    return bits[:, ni:]
+
+# Final and peak level of every gate, each of shape (batch, len(combos),
+# len(gates)), for a batch of cutoff parameters of shape (batch, len(gates))
+def levels(engine, params, combos, high, imax, block=256):
+    nb = len(params[0])
+    nc = len(combos)
+    ni = len(engine.inputs)
+    sub = engine.assign(*[np.repeat(p, nc, axis=0) for p in params])
+    inputs = np.tile(combos * float(high), (nb, 1))
+    cur = np.empty((nb * nc, len(engine.nodes)))
+    cur[:, :ni] = inputs
+    cur[:, ni:] = engine.initial
+    peak = cur[:, ni:].copy()
+    out = np.empty((nb * nc, len(engine.gates), block))
+    for t in range(1, imax, block):
+        n = min(block, imax - t)
+        signals = np.broadcast_to(inputs[:, :, np.newaxis], inputs.shape + (n,))
+        sub.advance(cur, signals, 0, None, out[:, :, :n], engine.rows)
+        np.maximum(peak, out[:, :, :n].max(axis=-1), out=peak)
+    shape = (nb, nc, len(engine.gates))
+    return cur[:, ni:].reshape(shape), peak.reshape(shape)
+
+# Same as levels, rebuilding the engine so that it can run in a worker
+def levels_chunk(builder, kwargs, params, combos, high, imax):
+    return levels(Engine(builder(imax=0, **kwargs)), params, combos, high, imax)
+
+# log10(min on / max off) of each candidate, for the gates in slots
+def separation(final, off, bits, slots):
+    on = bits[:, slots]
+    lo = np.where(on, final[:, :, slots], np.inf).min(axis=1)
+    hi = np.where(on, -np.inf, off[:, :, slots]).max(axis=1)
+    ratio = np.log10(np.maximum(lo, 1e-300)) - np.log10(np.maximum(hi, 1e-300))
+    # gates that are always on or always off are not scored
+    return np.where(on.all(axis=0) | ~on.any(axis=0), np.inf, ratio)
+
+# Result of a search
+# - parts: name of the part of each assigned gate, by position among the
+#   gates of the engine (names of gates need not be unique)
+# - names: name of those gates
+# - score: score of the best assignment
+# - ranking: (score, parts) of the best complete assignments
+class Assignment:
+    def __init__(self, names, ranking):
+        self.names = names
+        self.ranking = ranking
+        self.score, self.parts = ranking[0] if ranking else (-np.inf, None)
+
+    # Give the parts to the gates of a circuit built like the searched one
+    def apply(self, circuit, library=None):
+        library = library or data
+        engine = Engine(circuit)
+        for (j, part) in self.parts.items():
+            g = engine.gates[j]
+            g.combinator = type(g.combinator)(library.cutoff(part))
+        circuit.engine = None
+        return circuit
+
+# Search the best parts for the circuit built by builder(imax=0, **kwargs)
+# (which must be feed-forward and picklable when workers != 1)
+def search(builder, library=None, *, imax=2000, high=1, beam=64, min_score=-np.inf, chunk=256, workers=1, **kwargs):
+    library = library or data
+    circuit = builder(imax=0, **kwargs)
+    engine = Engine(circuit)
+    if engine.cycles:
+        raise ValueError("the assignment search needs a feed-forward circuit")
+    ni = len(engine.inputs)
+    names = library.names()
+    table = [library.params[f] for f in ('ymax', 'ymin', 'k', 'n')]
+    slots = assignable(engine)
+    if len(slots) > len(names):
+        raise ValueError("{} gates but only {} parts".format(len(slots), len(names)))
+    combos = combinations(ni)
+    bits = truth(engine, combos)
+    outputs = [engine.row[id(g)] - ni for g in circuit.gates if not isinstance(g, Input)]
+    # assignable gates upstream of each gate (itself included), as positions in slots
+    position = { j: p for (p, j) in enumerate(slots) }
+    upstream = []
+    for j in range(len(engine.gates)):
+        stack = [j]
+        seen = set()
+        while stack:
+            g = stack.pop()
+            if g in seen:
+                continue
+            seen.add(g)
+            stack.extend(engine.row[id(i)] - ni for i in engine.gates[g].inputs if not isinstance(i, Input))
+        upstream.append(sorted(position[g] for g in seen if g in position))
+
+    # parameters of a batch of (partial) assignments, unassigned gates keep theirs
+    def params(candidates):
+        res = [np.tile(p, (len(candidates), 1)) for p in (engine.ymax, engine.ymin, engine.k, engine.n)]
+        for (b, cand) in enumerate(candidates):
+            for (p, part) in enumerate(cand):
+                for (r, col) in zip(res, table):
+                    r[b, slots[p]] = col[part]
+        return res
+
+    def evaluate(candidates):
+        batches = [params(candidates[i:i+chunk]) for i in range(0, len(candidates), chunk)]
+        if workers == 1:
+            parts = [levels(engine, b, combos, high, imax) for b in batches]
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                parts = list(pool.map(levels_chunk, itertools.repeat(builder), itertools.repeat(kwargs),
+                                      batches, itertools.repeat(combos), itertools.repeat(high), itertools.repeat(imax)))
+        return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+    memo = {}
+    entries = [((), np.inf)]
+    for (p, j) in enumerate(slots):
+        candidates = [(c + (part,), s) for (c, s) in entries for part in range(len(names)) if part not in c]
+        keys = [(j, tuple(c[q] for q in upstream[j])) for (c, _) in candidates]
+        todo = {}
+        for (key, (c, _)) in zip(keys, candidates):
+            if key not in memo and key not in todo:
+                todo[key] = c
+        if todo:
+            final, _ = evaluate(list(todo.values()))
+            for (key, score) in zip(todo, separation(final, final, bits, [j])[:, 0]):
+                memo[key] = score
+        entries = [(c, min(s, memo[key])) for ((c, s), key) in zip(candidates, keys)]
+        entries = [e for e in entries if e[1] >= min_score]
+        entries.sort(key=lambda e: -e[1])
+        if beam is not None:
+            entries = entries[:beam]
+
+    ranking = []
+    if entries:
+        final, peak = evaluate([c for (c, _) in entries])
+        out = separation(final, peak, bits, outputs).min(axis=1) if outputs else np.full(len(entries), np.inf)
+        scores = np.minimum([s for (_, s) in entries], out)
+        for b in np.argsort(-scores, kind='stable'):
+            if scores[b] >= min_score:
+                parts = { slots[p]: names[part] for (p, part) in enumerate(entries[b][0]) }
+                ranking.append((float(scores[b]), parts))
+    return Assignment([g.name for g in engine.gates], ranking)
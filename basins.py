@@ -0,0 +1,152 @@
+import numpy as np
+
+from circuit import dt
+from steady import solve
+
+# Basins of attraction of circuits with feedback, such as builders.latch
+#
+# Batches of noise-free transients (Engine.advance) are run chunk steps at
+# a time. Once the inputs of a trajectory are back at rest, it stops as
+# soon as it comes within tol of a stable steady state of the rest inputs
+# (see steady.solve), which labels it. Trajectories still running after
+# imax steps are labelled -1.
+# - basins: the initial state of some gates spans a grid, the inputs
+#   are held at rest
+# - switching: pulses of one or two inputs, of a grid of widths and
+#   delays, hit the circuit in its initial state
+
+# Label (index into attractors, or -1) and number of steps of every
+# trajectory from the states cur, of shape (batch, len(nodes))
+# signals(t, n, alive) gives the inputs of the trajectories alive for
+# steps t to t + n, of shape (len(alive), len(inputs), n), and quiet the
+# step of each trajectory after which its inputs stay at rest.
+def settle(engine, cur, signals, quiet, attractors, imax, chunk=256, tol=1e-2):
+    ni = len(engine.inputs)
+    label = np.full(len(cur), -1)
+    steps = np.full(len(cur), imax)
+    alive = np.arange(len(cur))
+    cur = cur.copy()
+    keep = np.empty(0, dtype=int)
+    for t in range(1, imax, chunk):
+        if not len(alive):
+            break
+        n = min(chunk, imax - t)
+        engine.advance(cur, signals(t, n, alive), 0, None, np.empty((len(alive), 0, n)), keep)
+        dist = np.abs(cur[:, np.newaxis, ni:] - attractors).max(axis=-1, initial=0)
+        near = (dist < tol) & (t + n > quiet[alive])[:, np.newaxis]
+        hit = near.any(axis=1)
+        label[alive[hit]] = np.argmax(near[hit], axis=1)
+        steps[alive[hit]] = t + n
+        alive = alive[~hit]
+        cur = cur[~hit]
+    return label, steps
+
+# Result of basins
+# - names: names of the gates whose initial state spans the grid
+# - axes: values of the initial state of each of those gates
+# - attractors: stable steady states, shape (n_attractors, len(gates))
+# - label: attractor reached from each point, shape (len(axes[0]), ...)
+# - steps: number of steps to reach it, of the same shape
+class Basins:
+    def __init__(self, names, axes, attractors, label, steps):
+        self.names = names
+        self.axes = axes
+        self.attractors = attractors
+        self.label = label
+        self.steps = steps
+
+    # Fraction of the grid in the basin of each attractor
+    def fractions(self):
+        return np.array([(self.label == a).mean() for a in range(len(self.attractors))])
+
+# Map the basins of attraction of the stable states of a circuit (or
+# Engine) whose inputs are held at rest (Booleans, 0 or high, all 0 by
+# default). axes gives the initial values of the named gates (all
+# combinations are run), by default 21 levels of each gate in a cycle
+# between 0 and its highest level. Other gates start from their initial
+# value.
+def basins(circuit, names=None, axes=None, rest=None, high=1, imax=10000, chunk=256, tol=1e-2):
+    engine = circuit.compile()
+    ni = len(engine.inputs)
+    slot = { g.name: j for (j, g) in enumerate(engine.gates) }
+    if names is None:
+        names = [g.name for cycle in engine.cycles for g in cycle]
+    cols = [slot[n] for n in names]
+    if axes is None:
+        top = engine.highest()
+        axes = [np.linspace(0, top[j], 21) for j in cols]
+    axes = [np.asarray(a, dtype=float) for a in axes]
+    rest = np.zeros(ni, dtype=bool) if rest is None else np.asarray(rest, dtype=bool)
+    steady = solve(engine, high, rest[np.newaxis])
+    attractors = steady.states(0)
+    grid = np.meshgrid(*axes, indexing='ij')
+    cur = np.empty((grid[0].size if axes else 1, len(engine.nodes)))
+    cur[:, :ni] = rest * float(high)
+    cur[:, ni:] = engine.initial
+    for (j, g) in zip(cols, grid):
+        cur[:, ni + j] = g.reshape(-1)
+    inputs = cur[:, :ni].copy()
+    signals = lambda t, n, alive: np.broadcast_to(inputs[alive][:, :, np.newaxis], (len(alive), ni, n))
+    label, steps = settle(engine, cur, signals, np.zeros(len(cur), dtype=int), attractors, imax, chunk, tol)
+    shape = tuple(len(a) for a in axes)
+    return Basins(names, axes, attractors, label.reshape(shape), steps.reshape(shape))
+
+# Result of switching
+# - widths, delays: the pulses tried
+# - attractors: stable steady states of the inputs at rest
+# - reference: attractor reached without any pulse
+# - label: attractor reached after each pulse, shape (len(widths), len(delays))
+# - steps: number of steps to reach it, of the same shape
+class Switching:
+    def __init__(self, widths, delays, attractors, reference, label, steps):
+        self.widths = widths
+        self.delays = delays
+        self.attractors = attractors
+        self.reference = reference
+        self.label = label
+        self.steps = steps
+
+    # Pulses that leave the circuit in another state than without pulse
+    def flips(self):
+        return (self.label != self.reference) & (self.label >= 0)
+
+    # Narrowest pulse that flips the circuit, for each delay (nan if none)
+    def threshold(self):
+        flips = self.flips()
+        first = np.argmax(flips, axis=0)
+        return np.where(flips.any(axis=0), self.widths[first], np.nan)
+
+# Switching thresholds of a circuit (or Engine) in its initial state
+# Input first (by default the first input) goes high for width hours from
+# start, input second (if any) for the same width from start + delay,
+# every combination of widths and delays being run. The other inputs
+# stay at 0.
+def switching(circuit, widths, delays=(0,), first=None, second=None, start=1, level=1, imax=10000, chunk=256, tol=1e-2):
+    engine = circuit.compile()
+    ni = len(engine.inputs)
+    row = { i.name: r for (r, i) in enumerate(engine.inputs) }
+    first = engine.inputs[0].name if first is None else first
+    widths = np.asarray(widths, dtype=float)
+    delays = np.asarray(delays, dtype=float)
+    steady = solve(engine, level, np.zeros((1, ni), dtype=bool))
+    attractors = steady.states(0)
+    w, d = (a.reshape(-1) for a in np.meshgrid(widths, delays, indexing='ij'))
+    # pulses in steps, the first variant has no pulse and gives the reference
+    on = np.round(np.append(0, w) / dt).astype(int)
+    begin = np.full(len(on), int(round(start / dt)))
+    begin2 = np.maximum(begin + np.round(np.append(0, d) / dt).astype(int), 0)
+    quiet = np.maximum(begin + on, begin2 + on if second is not None else 0)
+
+    def signals(t, n, alive):
+        res = np.zeros((len(alive), ni, n))
+        s = t + np.arange(n)
+        res[:, row[first]] = level * ((s >= begin[alive, np.newaxis]) & (s < (begin + on)[alive, np.newaxis]))
+        if second is not None:
+            res[:, row[second]] = level * ((s >= begin2[alive, np.newaxis]) & (s < (begin2 + on)[alive, np.newaxis]))
+        return res
+
+    cur = np.zeros((len(on), len(engine.nodes)))
+    cur[:, ni:] = engine.initial
+    label, steps = settle(engine, cur, signals, quiet, attractors, imax, chunk, tol)
+    shape = (len(widths), len(delays))
+    return Switching(widths, delays, attractors, label[0], label[1:].reshape(shape), steps[1:].reshape(shape))
@@ -0,0 +1,96 @@
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+
+from builders import *
+
+def examples():
+    return [
+        ("xor", xor, dict(delay=0.5, start=10, pulse_a=3, pulse_b=4)),
+        ("three_way_and", three_way_and, dict(delay_ab=0.5, delay_ac=1, start=10, pulse_a=3, pulse_b=3, pulse_c=3)),
+        ("false", false, dict(start=10, pulse=3)),
+        ("latch", latch, dict(delay_a=0, delay_b=4, start=8, pulse_a=3, pulse_b=3)),
+        # real_nor has no noise, sigma is ignored
+        ("real_nor", lambda sigma, **kw: real_nor(**kw), dict(delay_ab=0.5, start=5, pulse_a=3, pulse_b=3)),
+    ]
+
+def synthetic(sizes):
+    cases = []
+    for n in sizes:
+        cases.append(("nor_chain {}".format(n), nor_chain, dict(n=n)))
+        cases.append(("nor_tree {}".format(n), nor_tree, dict(depth=max(1, int(np.log2(n))))))
+        cases.append(("ring_oscillator {}".format(n), ring_oscillator, dict(n=n | 1)))
+    return cases
+
+# Best time of repeat runs of builder, and the peak of memory allocated
+# during one of them (noise and signal caches are cleared first so that
+# every run starts cold)
+def measure(builder, kwargs, imax, sigma, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        Noise.clear()
+        Input.cache.clear()
+        t = time.perf_counter()
+        c = builder(imax=imax, sigma=sigma, **kwargs)
+        best = min(best, time.perf_counter() - t)
+    Noise.clear()
+    Input.cache.clear()
+    tracemalloc.start()
+    builder(imax=imax, sigma=sigma, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    gates = len(c.nodes()) - len(c.engine.inputs)
+    return {
+        'gates': gates,
+        'seconds': best,
+        'per_step_gate': best / (imax * max(gates, 1)),
+        'peak_bytes': peak,
+    }
+
+def run(cases, imaxs, sigmas, repeat):
+    results = []
+    for (name, builder, kwargs) in cases:
+        for imax in imaxs:
+            for sigma in sigmas:
+                res = dict(case=name, imax=imax, sigma=sigma)
+                res.update(measure(builder, kwargs, imax, sigma, repeat))
+                print("{case:24} imax={imax:<7} sigma={sigma:<6} {gates:5} gates "
+                      "{seconds:9.4f} s {per_step_gate:.2e} s/step/gate {peak_bytes:>11} B".format(**res))
+                results.append(res)
+    return results
+
+# Ratio of the times of the results to those of a previous file
+def compare(results, path):
+    with open(path) as f:
+        old = { (r['case'], r['imax'], r['sigma']): r for r in json.load(f)['results'] }
+    for r in results:
+        o = old.get((r['case'], r['imax'], r['sigma']))
+        if o is not None:
+            print("{:24} imax={:<7} sigma={:<6} x{:.2f} time x{:.2f} memory".format(
+                r['case'], r['imax'], r['sigma'],
+                r['seconds'] / o['seconds'], r['peak_bytes'] / max(o['peak_bytes'], 1)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the example and synthetic circuits")
+    parser.add_argument('--imax', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--sigma', type=float, nargs='+', default=[0, 0.01])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='bench.json')
+    parser.add_argument('--compare', help="previous JSON output to compare with")
+    args = parser.parse_args()
+    results = run(examples() + synthetic(args.sizes), args.imax, args.sigma, args.repeat)
+    with open(args.output, 'w') as f:
+        json.dump({
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'results': results,
+        }, f, indent=1)
+    if args.compare:
+        compare(results, args.compare)
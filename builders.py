@@ -0,0 +1,218 @@
+from circuit import *
+
+# Circuit builders, shared by the interactive explorers (xor.py, and.py,
+# false.py, latch.py, real_gates.py), sweeps, Monte Carlo runs and
+# benchmarks. Each one builds a circuit, runs it for imax steps (imax=0
+# only builds it) and returns it. Importing this module does not import
+# matplotlib.
+
+def xor(*, delay, imax, start, pulse_a, pulse_b, sigma, use_expstep=False):
+    if use_expstep:
+        f = lambda pulse, delay: Input.expstep(
+            start=start,
+            stop=start + pulse,
+            tau_emit=0.5,
+            tau_decay=0.5,
+            delay=delay,
+        )
+    else:
+        f = lambda pulse, delay: Input.heaviside(
+            start=start,
+            stop=start + pulse,
+            delay=delay,
+        )
+    a = Input("A", 'grey', f(pulse_a, 0))
+    b = Input("B", 'darkgrey', f(pulse_b, delay))
+    a_eq = Gate("=A", 'green', Same.default(), Timer.default(), a)
+    b_eq = Gate("=B", 'green', Same.default(), Timer.default(), b)
+    a_b_nor = Gate("A !| B", 'orange', Nor.default(), Timer.default(), a, b)
+    a_b_nor_b_nor = Gate("(A !| B) !| B", '', Nor.default(), Timer.default(), a_b_nor, b)
+    a_b_nor_a_nor = Gate("(A !| B) !| A", '', Nor.default(), Timer.default(), a_b_nor, a)
+    a_b_nor_b_eq_nor = Gate("(A !| B) !| =B", '', Nor.default(), Timer.default(), a_b_nor, b_eq)
+    a_b_nor_a_eq_nor = Gate("(A !| B) !| =A", '', Nor.default(), Timer.default(), a_b_nor, a_eq)
+    a_b_xor = Gate("A ^ B", 'red', Merge.default(), Timer.default(), a_b_nor_a_nor, a_b_nor_b_nor)
+    a_b_eqxor = Gate("A =^ B", 'blue', Merge.default(), Timer.default(), a_b_nor_a_eq_nor, a_b_nor_b_eq_nor)
+    c = Circuit(
+        a, b,
+        a_b_xor,
+        a_b_eqxor,
+    )
+    c.run(imax, sigma)
+    return c
+
+
+def three_way_and(*, delay_ab, delay_ac, imax, start, pulse_a, pulse_b, pulse_c, sigma, use_expstep=False):
+    if use_expstep:
+        f = lambda pulse, delay: Input.expstep(
+            start=start,
+            stop=start + pulse,
+            tau_emit=0.5,
+            tau_decay=0.5,
+            delay=delay,
+        )
+    else:
+        f = lambda pulse, delay: Input.heaviside(
+            start=start,
+            stop=start + pulse,
+            delay=delay,
+        )
+    a = Input("A", 'grey', f(pulse_a, 0))
+    b = Input("B", 'darkgrey', f(pulse_b, delay_ab))
+    c = Input("C", 'lightgray', f(pulse_c, delay_ac))
+    a_b_and = Gate("A & B", '', And.default(), Timer.default(), a, b)
+    b_c_and = Gate("A & C", '', And.default(), Timer.default(), b, c)
+    a_c_and = Gate("A & C", '', And.default(), Timer.default(), a, c)
+    a_b_and_c_and = Gate("(A & B) & C", 'red', And.default(), Timer.default(), a_b_and, c)
+    a_b_c_and_and = Gate("A & (B & C)", 'orange', And.default(), Timer.default(), a, b_c_and)
+    a_c_and_b_and = Gate("B & (A & C)", 'yellow', And.default(), Timer.default(), b, a_c_and)
+    a_eq = Gate("=A", '', Same.default(), Timer.default(), a)
+    b_eq = Gate("=B", '', Same.default(), Timer.default(), b)
+    c_eq = Gate("=C", '', Same.default(), Timer.default(), c)
+    a_b_and_c_eq_and = Gate("(A & B) & =C", 'blue', And.default(), Timer.default(), a_b_and, c_eq)
+    a_eq_b_c_and_and = Gate("=A & (B & C)", 'green', And.default(), Timer.default(), a_eq, b_c_and)
+    a_c_and_b_eq_and = Gate("=B & (A & C)", 'cyan', And.default(), Timer.default(), b_eq, a_c_and)
+    c = Circuit(
+        a, b, c,
+        a_b_and_c_and,
+        #a_b_c_and_and,
+        #a_c_and_b_and,
+        a_b_and_c_eq_and,
+        #a_eq_b_c_and_and,
+        #a_c_and_b_eq_and,
+    )
+    c.run(imax, sigma)
+    return c
+
+
+def false(*, imax, start, pulse, sigma, use_expstep=False):
+    if use_expstep:
+        f = lambda pulse: Input.expstep(
+            start=start,
+            stop=start + pulse,
+            tau_emit=0.5,
+            tau_decay=0.5,
+            delay=0,
+        )
+    else:
+        f = lambda pulse: Input.heaviside(
+            start=start,
+            stop=start + pulse,
+            delay=0,
+        )
+    a = Input("A", 'grey', f(pulse))
+    a_eq = Gate("=A", 'green', Same.default(), Timer.default(), a)
+    a_not = Gate("!A", 'orange', Not.default(), Timer.default(), a)
+    false = Gate("A & !A", 'red', And.default(), Timer.default(), a, a_not)
+    true = Gate("A | !A", 'red', Or.default(), Timer.default(), a, a_not)
+    false_eq = Gate("=A & !A", 'blue', And.default(), Timer.default(), a_eq, a_not)
+    true_eq = Gate("=A | !A", 'blue', Or.default(), Timer.default(), a_eq, a_not)
+    c = Circuit(
+        a,
+        false, false_eq,
+        true, true_eq,
+    )
+    c.run(imax, sigma)
+    return c
+
+
+def latch(*, delay_a, delay_b, imax, start, pulse_a, pulse_b, sigma, use_expstep=False, signals="AB"):
+    if use_expstep:
+        f = lambda pulse, delay: Input.expstep(
+            start=start,
+            stop=start + pulse,
+            tau_emit=0.5,
+            tau_decay=0.5,
+            delay=delay,
+        )
+    else:
+        f = lambda pulse, delay: Input.heaviside(
+            start=start,
+            stop=start + pulse,
+            delay=delay,
+        )
+    fn_a = f(pulse_a, delay_a) if "A" in signals else lambda *_: 0
+    fn_b = f(pulse_b, delay_b) if "B" in signals else lambda *_: 0
+    a = Input("A", 'grey', fn_a)
+    b = Input("B", 'darkgrey', fn_b)
+    p = Gate("P: A !| Q", 'cyan', Nor.default(), Timer.default(), a, initial=1)
+    q = Gate("Q: B !| P", 'blue', Nor.default(), Timer.default(), b, initial=0)
+    p.push_input(q)
+    q.push_input(p)
+    c = Circuit(
+        a, b,
+        p, q,
+    )
+    c.run(imax, sigma)
+    return c
+
+# DNA-binding proteins
+class RealNor(Gate):
+    def __init__(self, name, color, *inputs):
+        super().__init__(name, color, Nor(Cutoff.default()), Timer(emit=36/60,decay=35/60), *inputs)
+
+# CRISPRi
+class RealNorCRISPRi(Gate):
+    def __init__(self, name, color, *inputs):
+        super().__init__(name, color, Nor(Cutoff.default()), Timer(emit=35/60,decay=47/60), *inputs)
+
+
+def real_nor(*, delay_ab, imax, start, pulse_a, pulse_b, mecanism='protein'):
+    f = lambda pulse, delay: Input.heaviside(
+            start=start,
+            stop=start + pulse,
+            delay=delay,
+        )
+    a = Input("A", 'grey', f(pulse_a, 0))
+    b = Input("B", 'darkgrey', f(pulse_b, delay_ab))
+    if mecanism == 'protein':
+        a_b_nor = RealNor("A NOR B", 'red',a,b)
+    if mecanism == 'crispri':
+        a_b_nor = RealNorCRISPRi("A NOR B", 'red',a,b)
+    c = Circuit(
+        a, b,
+        a_b_nor
+    )
+    c.run(imax, sigma=0)
+    return c
+
+
+# Synthetic circuits of growing size, driven by pulses on A and B
+
+def pulses(start=10, pulse=3):
+    a = Input("A", 'grey', Input.heaviside(start=start, stop=start + pulse, delay=0))
+    b = Input("B", 'darkgrey', Input.heaviside(start=start, stop=start + pulse, delay=1))
+    return a, b
+
+# n NOR gates, each one fed by the previous one and B
+def nor_chain(*, n, imax, sigma):
+    a, b = pulses()
+    g = a
+    for i in range(n):
+        g = Gate("nor {}".format(i), '', Nor.default(), Timer.default(), g, b)
+    c = Circuit(a, b, g)
+    c.run(imax, sigma)
+    return c
+
+# Balanced tree of NOR gates of the given depth, with A and B at the leaves
+def nor_tree(*, depth, imax, sigma):
+    a, b = pulses()
+    layer = [a, b] * 2 ** (depth - 1)
+    level = 0
+    while len(layer) > 1:
+        layer = [
+            Gate("nor {} {}".format(level, i), '', Nor.default(), Timer.default(), x, y)
+            for (i, (x, y)) in enumerate(zip(layer[::2], layer[1::2]))
+        ]
+        level += 1
+    c = Circuit(a, b, layer[0])
+    c.run(imax, sigma)
+    return c
+
+# Ring of n (odd) NOT gates, each one fed by the previous one
+def ring_oscillator(*, n, imax, sigma):
+    gates = [Gate("not {}".format(i), '', Not.default(), Timer.default(), initial=i % 2) for i in range(n)]
+    for (i, g) in enumerate(gates):
+        g.push_input(gates[i - 1])
+    c = Circuit(*gates)
+    c.run(imax, sigma)
+    return c
@@ -1,61 +1,197 @@
+import hashlib
+import os
+from collections import Counter, OrderedDict
+from functools import lru_cache
+
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.widgets import Slider, Button
 
 # Minimum computable time variation
 dt = 0.01
 
-# Read parameters from csv file
-class Data:
-    def __init__(self, fname):
-        with open(fname, 'r') as f:
+# Library of characterized parts, read from a csv file with columns
+# name,ymax,ymin,K,n,equation
+# - the file is parsed on first use into params, a structured array with
+#   one row per part (fields name, ymax, ymin, k, n, equation), and index
+#   gives the row of each name
+# - the parsed array is cached next to the csv (path + '.npy') and parsed
+#   again whenever the csv is newer than the cache
+# Libraries are shared by path, see Library.open.
+class Library:
+    libraries = {}
+    # the only equation that Cutoff implements
+    hill = "ymin+(ymax-ymin)/(1.0+(x/K)^n)"
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = None
+
+    def open(path):
+        path = os.path.abspath(path)
+        if path not in Library.libraries:
+            Library.libraries[path] = Library(path)
+        return Library.libraries[path]
+
+    def load(self):
+        mtime = os.path.getmtime(self.path)
+        if mtime == self.mtime:
+            return
+        cache = self.path + '.npy'
+        self.params = None
+        if os.path.exists(cache) and os.path.getmtime(cache) >= mtime:
+            try:
+                self.params = np.load(cache)
+            except (OSError, ValueError, EOFError):
+                # damaged cache, parsed and written again
+                pass
+        if self.params is None:
+            self.params = self.parse()
+            # written to a temporary file then renamed, so that concurrent
+            # loads (e.g. by worker processes) never read a partial cache
+            tmp = '{}.{}.tmp'.format(cache, os.getpid())
+            try:
+                with open(tmp, 'wb') as f:
+                    np.save(f, self.params)
+                os.replace(tmp, cache)
+            except OSError:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        self.index = { name: i for (i, name) in enumerate(self.params['name'].tolist()) }
+        self.order = np.argsort(self.params['name'])
+        self.mtime = mtime
+
+    def parse(self):
+        with open(self.path, 'r') as f:
             cols = f.readline()
-            assert cols == "name,ymax,ymin,K,n,equation\n"
-            self.vals = {}
-            for line in f.readlines():
-                name, ymax, ymin, k, n, _ = line.split(',')
-                self.vals[name] = {
-                    "ymax": float(ymax),
-                    "ymin": float(ymin),
-                    "k": float(k),
-                    "n": float(n),
-                }
-data = Data("sshapes.csv")
+            assert cols.strip() == "name,ymax,ymin,K,n,equation"
+            rows = [line.strip().split(',') for line in f if line.strip()]
+        width = max([len(r[0]) for r in rows] + [1])
+        eq = max([len(r[5]) for r in rows] + [1])
+        dtype = [('name', 'U{}'.format(width)), ('ymax', float), ('ymin', float),
+                 ('k', float), ('n', float), ('equation', 'U{}'.format(eq))]
+        return np.array([(r[0], r[1], r[2], r[3], r[4], r[5]) for r in rows], dtype=dtype)
+
+    def names(self):
+        self.load()
+        return self.params['name'].tolist()
+
+    # Rows of an array of names
+    def rows(self, names):
+        self.load()
+        names = np.asarray(names)
+        sorted_names = self.params['name'][self.order]
+        i = np.minimum(np.searchsorted(sorted_names, names), len(sorted_names) - 1)
+        if not np.all(sorted_names[i] == names):
+            raise KeyError(names[sorted_names[i] != names].tolist())
+        return self.order[i]
+
+    # Cutoff of a part, or of an array of parts with array parameters
+    def cutoff(self, name):
+        self.load()
+        p = self.params[self.index[name] if np.ndim(name) == 0 else self.rows(name)]
+        bad = np.atleast_1d(p['equation'] != Library.hill)
+        if bad.any():
+            raise ValueError("unsupported equation {}".format(np.atleast_1d(p['equation'])[bad][0]))
+        if np.ndim(name) == 0:
+            return Cutoff(ymax=float(p['ymax']), ymin=float(p['ymin']), k=float(p['k']), n=float(p['n']))
+        return Cutoff(ymax=p['ymax'], ymin=p['ymin'], k=p['k'], n=p['n'])
+
+    # Parameters as a dict of dicts, by name
+    @property
+    def vals(self):
+        self.load()
+        return { str(p['name']): { k: float(p[k]) for k in ('ymax', 'ymin', 'k', 'n') } for p in self.params }
+
+data = Library.open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "sshapes.csv"))
+
+# Lookup table of an S-shaped response, accurate to tol
+# Values are sampled every h from 0, so that the interval of x is found
+# by a division instead of a search. The table stops where the response
+# comes within tol of ymin (clamp is then True and the last value can be
+# used beyond) or at max_size values (beyond which the exact response
+# must be computed). Tables are shared by cutoffs with the same parameters.
+@lru_cache(maxsize=256)
+def hill_table(ymax, ymin, k, n, tol, max_size=2**16):
+    f = lambda x: ymin + (ymax - ymin) / (1 + (x / k) ** n)
+    hi = k * max(abs(ymax - ymin) / tol, 1) ** (1 / n)
+    # linear interpolation is within h^2/8 max|f''| of f
+    x = np.linspace(0, hi, 100001)
+    d2 = np.abs(np.diff(f(x), 2)).max() / (x[1] ** 2)
+    h = np.sqrt(8 * tol / max(d2, 1e-300))
+    while True:
+        size = min(int(np.ceil(hi / h)) + 1, max_size)
+        xs = np.arange(size) * h
+        ys = f(xs)
+        if np.all(np.abs((ys[1:] + ys[:-1]) / 2 - f(xs[:-1] + h / 2)) <= tol):
+            break
+        h /= 2
+    ys.flags.writeable = False
+    return h, ys, xs[-1] >= hi
 
 # Parametrized S-shaped response
+# With tol set, the response is interpolated from a table instead of
+# computing a fractional power.
 class Cutoff:
-    def __init__(self, *, ymax, ymin, k, n):
+    def __init__(self, *, ymax, ymin, k, n, tol=None):
         self.ymax = ymax
         self.ymin = ymin
         self.k = k
         self.n = n
+        self.tol = tol
+
+    # Same response, tabulated
+    def tabulated(self, tol=1e-4):
+        return Cutoff(ymax=self.ymax, ymin=self.ymin, k=self.k, n=self.n, tol=tol)
+
+    def table(self):
+        return hill_table(self.ymax, self.ymin, self.k, self.n, self.tol)
 
     # Some arbitrary values
     def default():
         return Cutoff(ymax=1, ymin=0, k=0.3, n=4.7)
 
-    def list_name():
-        return list(data.vals.keys())
+    # Parts of a Library, by default the one of sshapes.csv
+    def list_name(library=None):
+        return (library or data).names()
 
-    def from_name(key):
-        d = data.vals[key]
-        return Cutoff(ymax=d["ymax"], ymin=d["ymin"], k=d["k"], n=d["n"])
+    def from_name(key, library=None):
+        return (library or data).cutoff(key)
 
+    # Works on scalars and on arrays of any shape, the parameters may
+    # also be arrays that broadcast against x
     def steady_state(self, x):
-        return self.ymin + (self.ymax - self.ymin) / (1 + (max(x,0) / self.k) ** self.n)
+        x = np.maximum(x, 0)
+        if self.tol is not None:
+            return self.lookup(x)
+        # float_power keeps the libm pow of the scalar formula on arrays
+        return self.ymin + (self.ymax - self.ymin) / (1 + np.float_power(x / self.k, self.n))
+
+    # Interpolate the table of a tabulated cutoff
+    def lookup(self, x):
+        h, ys, clamp = self.table()
+        u = x / h
+        v = np.minimum(u, len(ys) - 1)
+        i = np.minimum(v.astype(np.intp), len(ys) - 2)
+        y = ys[i] + (ys[i+1] - ys[i]) * (v - i)
+        # past the end of tables that do not reach ymin
+        if not clamp:
+            over = u > len(ys) - 1
+            if np.any(over):
+                y = np.array(y)
+                x = np.broadcast_to(x, y.shape)
+                y[over] = self.ymin + (self.ymax - self.ymin) / (1 + np.float_power(x[over] / self.k, self.n))
+            y = y[()]
+        return y
 
     # Eliminate NaN, clamp out-of-range responses
     def steady_state_clamp(self, x):
         y = self.steady_state(x)
-        if 0 < y < 100:
-            return y
-        else:
-            return 0
+        return np.where((0 < y) & (y < 100), y, 0)[()]
 
     # Plot self.steady_state(x) as a function of x
     def plot_static(self, xrange):
+        import matplotlib.pyplot as plt
         X = np.linspace(*xrange, 100)
-        Y = [ self.steady_state_clamp(x) for x in X ]
+        Y = self.steady_state_clamp(X)
         plt.plot(X, Y, label="y_max={} y_min={} K={} n={}".format(self.ymax, self.ymin, self.k, self.n))
 
 # Non-instantaneous processes share a common decay rate
@@ -68,6 +204,8 @@ class Timer:
         return Timer(emit=1, decay=1)
 
 # A combinator is any logical gate
+# Inputs may be scalars or arrays, which are broadcast together
+# logic gives the Boolean function that the gate implements
 class Combinator:
     def __init__(self, cutoff):
         self.cutoff = cutoff
@@ -80,142 +218,589 @@ class Combinator:
         return cls(Cutoff.default())
 
     @classmethod
-    def from_name(cls, key=None):
-        return cls(Cutoff.from_name(key))
+    def from_name(cls, key=None, library=None):
+        return cls(Cutoff.from_name(key, library))
 
 class Not(Combinator):
     def activation(self, x):
         return x
 
+    def logic(self, x):
+        return np.logical_not(x)
+
 class Same(Combinator):
     def activation(self, x):
         return 1 - x
 
+    def logic(self, x):
+        return np.asarray(x, dtype=bool)
+
 class And(Combinator):
     def activation(self, x, y):
         return 1 - x * y
 
+    def logic(self, x, y):
+        return np.logical_and(x, y)
+
 class Or(Combinator):
     def activation(self, x, y):
         return (1-x) * (1-y)
 
+    def logic(self, x, y):
+        return np.logical_or(x, y)
+
 class Nor(Combinator):
     def activation(self, x, y):
         return 1 - (1-x) * (1-y)
 
+    def logic(self, x, y):
+        return np.logical_not(np.logical_or(x, y))
+
 class Nand(Combinator):
     def activation(self, x, y):
         return x * y
 
+    def logic(self, x, y):
+        return np.logical_not(np.logical_and(x, y))
+
 class Merge(Combinator):
     def response(self, x, y):
         return x + y
 
+    def logic(self, x, y):
+        return np.logical_or(x, y)
+
 # Caching of random noise
 # - saves on computation time
 # - avoids distractions due to noise being completely different
-class Random:
-    data = []
-    idx = 0
-
-    # Either return a cached result or extend the values
-    def sample():
-        while Random.idx >= len(Random.data):
-            Random.data.append(np.random.normal(0., 1.))
-        res = Random.data[Random.idx]
-        Random.idx += 1
-        return res
-
-    def reset():
-        Random.idx = 0
+# Each gate draws its noise from its own stream, derived from Noise.seed
+# and the key of the gate: its noise_key when given, its name otherwise.
+# A gate thus sees the same noise whatever the order of the gates in its
+# circuit, the order of evaluation or the length of the run. Gates that
+# share a name are told apart in a circuit, see Noise.keys, gates given
+# the same noise_key share their noise.
+# Noise comes as a (len(keys), n_steps) table of standard normal samples,
+# one row per key. Tables are kept for reuse by later runs, the least
+# recently used ones are evicted once there are more than Noise.capacity.
+class Noise:
+    seed = 0
+    capacity = 8
+    cache = OrderedDict()
+
+    def key(gate):
+        return gate.name if gate.noise_key is None else gate.noise_key
+
+    # Distinct keys of the gates of a circuit: gates without noise_key
+    # that share a name are told apart by the names of their inputs, then
+    # by their position among the gates sharing both
+    def keys(gates):
+        keys = [Noise.key(g) for g in gates]
+        count = Counter(keys)
+        keys = [k if count[k] == 1 or g.noise_key is not None else "{}({})".format(k, ", ".join(i.name for i in g.inputs))
+                for (k, g) in zip(keys, gates)]
+        count = Counter(keys)
+        seen = Counter()
+        res = []
+        for (k, g) in zip(keys, gates):
+            if count[k] > 1 and g.noise_key is None:
+                seen[k] += 1
+                k = "{}#{}".format(k, seen[k])
+            res.append(k)
+        return tuple(res)
+
+    # Integer keys are used as they are, string keys through a hash that
+    # does not change between sessions
+    def rng(key):
+        if isinstance(key, str):
+            key = (1, int.from_bytes(hashlib.sha256(key.encode()).digest()[:16], 'little'))
+        else:
+            key = (0, int(key))
+        return np.random.default_rng((Noise.seed,) + key)
+
+    def row(key, n_steps):
+        return Noise.rng(key).standard_normal(n_steps)
+
+    def table(keys, n_steps):
+        keys = tuple(keys)
+        cache_key = (Noise.seed, keys, n_steps)
+        if cache_key in Noise.cache:
+            Noise.cache.move_to_end(cache_key)
+            return Noise.cache[cache_key]
+        tab = np.empty((len(keys), n_steps))
+        for (i, key) in enumerate(keys):
+            tab[i] = Noise.row(key, n_steps)
+        Noise.cache[cache_key] = tab
+        while len(Noise.cache) > Noise.capacity:
+            Noise.cache.popitem(last=False)
+        return tab
+
+    def clear():
+        Noise.cache.clear()
+
+    # Same samples as the table, column by column without ever holding
+    # the whole table: yields (len(keys), chunk) blocks of the columns
+    # [start, start + chunk), [start + chunk, start + 2 chunk)...
+    def stream(keys, chunk, start=0):
+        rngs = [Noise.rng(key) for key in keys]
+        for r in rngs:
+            for n in [chunk] * (start // chunk) + [start % chunk]:
+                r.standard_normal(n)
+        while True:
+            yield np.stack([r.standard_normal(chunk) for r in rngs]).reshape(len(rngs), chunk)
+
+# Evaluation order of every node reachable from the outputs
+# - order: the inputs of a node come before the node itself, except along
+#   feedback loops created with push_input
+# - cycles: the strongly connected components that contain a feedback
+#   loop, each as a list of nodes in order
+# The graph is traversed with an explicit stack (Tarjan's algorithm) so
+# that circuits thousands of gates deep cannot hit the recursion limit.
+# Gates read their inputs from the previous step, so every node can be
+# updated once per step in this order, cycles included.
+class Schedule:
+    def __init__(self, outputs):
+        self.order = []
+        self.cycles = []
+        index = {}
+        low = {}
+        finish = {}
+        stack = []
+        active = set()
+        def visit(node):
+            index[id(node)] = low[id(node)] = len(index)
+            stack.append(node)
+            active.add(id(node))
+            return (node, iter(getattr(node, 'inputs', [])))
+        for root in outputs:
+            if id(root) in index:
+                continue
+            work = [visit(root)]
+            while work:
+                node, pending = work[-1]
+                for i in pending:
+                    if id(i) not in index:
+                        work.append(visit(i))
+                        break
+                    if id(i) in active:
+                        low[id(node)] = min(low[id(node)], index[id(i)])
+                else:
+                    work.pop()
+                    finish[id(node)] = len(self.order)
+                    self.order.append(node)
+                    if work:
+                        parent = id(work[-1][0])
+                        low[parent] = min(low[parent], low[id(node)])
+                    if low[id(node)] == index[id(node)]:
+                        # node is the root of a strongly connected component
+                        scc = []
+                        while not scc or scc[-1] is not node:
+                            scc.append(stack.pop())
+                            active.discard(id(scc[-1]))
+                        if len(scc) > 1 or any(i is node for i in getattr(node, 'inputs', [])):
+                            self.cycles.append(sorted(scc, key=lambda n: finish[id(n)]))
+
+# Gates and inputs write their output to a preallocated float64 buffer,
+# usually a row of the state of the Circuit that runs them
+class Node:
+    # Use buf as output buffer, only the first step is kept
+    def attach(self, buf):
+        buf[0] = self.first()
+        self.output = buf
+        # number of steps already computed
+        self.size = 1
+
+    # Grow the buffer when out is called beyond its end
+    def reserve(self, n):
+        if len(self.output) < n:
+            buf = np.empty(max(n, 2 * len(self.output)))
+            buf[:self.size] = self.output[:self.size]
+            self.output = buf
 
 # instanciation of a logical gate takes
 # - cosmetic parameters name and color
 # - the description of the function
 # - time variation parameters
 # - the inputs
-class Gate:
-    def __init__(self, name, color, combinator, timer, *inputs, initial=0):
+# - the key of its noise, see Noise
+class Gate(Node):
+    def __init__(self, name, color, combinator, timer, *inputs, initial=0, noise_key=None):
         self.name = name
         self.color = color
         self.combinator = combinator
         self.timer = timer
         self.inputs = list(inputs)
-        self.output = [initial]
+        self.initial = initial
+        self.noise_key = noise_key
+        self.attach(np.empty(1))
+        # noise of the first steps, drawn on demand, and its key
+        self.noise = None
+        self.noise_of = None
+        # (signature, engine) of the nodes out depends on
+        self.compiled = None
+
+    def first(self):
+        return self.initial
 
     # For non-linear circuits, allows solving dependency cycles
     def push_input(self, i):
         self.inputs.append(i)
 
-    # Plot response function
-    def plot_static(self, xrange, yrange):
+    # Plot response function, as a surface for gates with two inputs
+    def plot_static(self, xrange, yrange=None):
+        import matplotlib.pyplot as plt
         fig = plt.figure()
-        ax = plt.axes(projection='3d')
         x = np.linspace(*xrange, 100)
+        if len(self.inputs) < 2:
+            plt.plot(x, self.combinator.response(x), label=self.name)
+            plt.show()
+            return
+        ax = plt.axes(projection='3d')
         y = np.linspace(*yrange, 100)
         X, Y = np.meshgrid(x, y)
         Z = self.combinator.response(X, Y)
         ax.plot_surface(X, Y, Z, rstride=1, cstride=1, cmap='viridis', edgecolor='none')
         plt.show()
 
-    # Compute output
+    # Noise of the first n steps at least, of the given key (by default
+    # the last one used, or Noise.key(self))
+    def noise_row(self, n, key=None):
+        if key is None:
+            key = Noise.key(self) if self.noise_of is None else self.noise_of
+        if self.noise is None or self.noise_of != key or len(self.noise) < n:
+            self.noise = Noise.row(key, max(n, 2 * len(self.output)))
+            self.noise_of = key
+        return self.noise
+
+    # Compute step t from the previous step of the inputs
+    def step(self, t, sigma):
+        self.reserve(t + 1)
+        ins = [i.output[t-1] for i in self.inputs]
+        # response yields gate activation
+        response = self.combinator.response(*ins)
+        down = self.output[t-1] * dt / self.timer.tau_decay
+        up = response * dt / self.timer.tau_emit
+        noise = self.noise_row(t + 1)[t] * sigma if sigma != 0 else 0
+        # solve differential equation accounting for both decay and production
+        self.output[t] = np.clip(self.output[t-1] + up - down + noise,0,1000)
+        self.size = t + 1
+
+    # Compute output up to step t, together with every node it depends on
+    # The nodes are advanced from the first step that one of them lacks,
+    # with the compiled engine of the circuit made of this gate, which is
+    # kept as long as the wiring, parameters and noise keys of its nodes
+    # are unchanged.
     def out(self, t, sigma):
-        while len(self.output) <= t:
-            t2 = len(self.output)
-            # get inputs if not already calculated
-            ins = [i.out(t2 - 1,sigma) for i in self.inputs]
-            # response yields gate activation
-            response = self.combinator.response(*ins)
-            down = self.output[t2-1] * dt / self.timer.tau_decay
-            up = response * dt / self.timer.tau_emit
-            noise = Random.sample() * sigma
-            # solve differential equation accounting for both decay and production
-            self.output.append(np.clip(self.output[t2-1] + up - down + noise,0,1000))
+        if self.size <= t:
+            if not self.current():
+                from engine import signature
+                engine = Circuit(self).compile()
+                self.compiled = (signature(engine.nodes), engine)
+            engine = self.compiled[1]
+            nodes = engine.nodes
+            ni = len(engine.inputs)
+            start = min(n.size for n in nodes)
+            cur = np.array([[n.output[start-1] for n in nodes]])
+            signals = engine.signals(t + 1, start=start, last=cur[0, :ni])[np.newaxis]
+            noise = None
+            if sigma != 0:
+                noise = np.array([[g.noise_row(t + 1, k)[start:t+1] for (g, k) in zip(engine.gates, engine.noise_keys)]])
+            out = np.empty((1, len(nodes), t + 1 - start))
+            engine.advance(cur, signals, sigma, noise, out, np.arange(len(nodes)))
+            for (n, row) in zip(nodes, out[0]):
+                n.reserve(t + 1)
+                n.output[start:t+1] = row
+                n.size = max(n.size, t + 1)
         return self.output[t]
 
-class Input:
+    # Whether the engine used by out still matches the nodes, a node
+    # wired to one outside of the engine changes the signature
+    def current(self):
+        from engine import signature
+        if self.compiled is None:
+            return False
+        sig, engine = self.compiled
+        try:
+            return signature(engine.nodes) == sig and Noise.keys(engine.gates) == engine.noise_keys
+        except KeyError:
+            return False
+
+@lru_cache(maxsize=None)
+def recording(path, mtime, column):
+    table = np.genfromtxt(path, delimiter=',')
+    table = table[~np.isnan(table[:, [0, column]]).any(axis=1)]
+    return table[:, 0], table[:, column]
+
+# Index of the first step s >= 0 such that s * dt >= x
+def first_step(x):
+    s = max(0, int(np.ceil(x / dt)))
+    while s > 0 and (s - 1) * dt >= x:
+        s -= 1
+    while s * dt < x:
+        s += 1
+    return s
+
+class Input(Node):
+    # Traces of vectorized signals, by parameters and range of steps
+    cache = OrderedDict()
+    capacity = 64
+
     def __init__(self, name, color, ind):
         self.name = name
         self.color = color
         # should be a float -> [0,1] function that tells the value
         self.ind = ind
-        self.output = [ind(0, 0, dt)]
+        self.attach(np.empty(1))
+
+    def first(self):
+        if hasattr(self.ind, 'trace'):
+            return self.ind.trace(1)[0]
+        return self.ind(0, 0, dt)
+
+    def step(self, t, sigma):
+        self.reserve(t + 1)
+        if hasattr(self.ind, 'trace'):
+            self.output[t] = self.ind.trace(len(self.output))[t]
+        else:
+            self.output[t] = self.ind(t * dt, self.output[t-1], dt)
+        self.size = t + 1
 
     def out(self, t, sigma):
-        while len(self.output) <= t:
-            self.output.append(
-                self.ind(len(self.output) * dt, self.output[-1], dt))
+        while self.size <= t:
+            self.step(self.size, sigma)
         return self.output[t]
 
+    # Signals may describe themselves to continuous-time integrators:
+    # - f.edges lists the times of discontinuities
+    # - f.derivative(t, x) is set when f integrates its own state x
+    # and to the engine:
+    # - f.trace(stop, start=0) gives the values of steps [start, stop) as
+    #   one (read-only) array, see Input.signal
+
+    # Vectorized signal, values(steps) computes the values of an array
+    # of steps at once. Traces are cached by key (the kind of signal and
+    # its parameters), so that circuits sharing an input compute it once,
+    # and the key tells the signal apart (see store.record).
+    # ind is the per-step function ind(t, last, dt).
+    def signal(key, values, edges, ind):
+        def trace(stop, start=0):
+            k = (key, start, stop, dt)
+            if k in Input.cache:
+                Input.cache.move_to_end(k)
+                return Input.cache[k]
+            res = np.asarray(values(np.arange(start, stop)), dtype=float)
+            res.flags.writeable = False
+            Input.cache[k] = res
+            while len(Input.cache) > Input.capacity:
+                Input.cache.popitem(last=False)
+            return res
+        ind.trace = trace
+        ind.edges = sorted(edges)
+        ind.key = key
+        return ind
+
+    # Signal that only depends on time, at(t) evaluates an array of times
+    def timed(key, at, edges):
+        return Input.signal(key, lambda steps: at(steps * dt), edges, lambda t, last, dt: at(np.array([t]))[0])
+
     def heaviside(*, start, stop, delay):
         def f(t, last, dt):
             if start + delay < t < stop + delay:
                 return 1
             else:
                 return 0
-        return f
-
+        def values(steps):
+            t = steps * dt
+            return (start + delay < t) & (t < stop + delay)
+        return Input.signal(('heaviside', start, stop, delay), values, [start + delay, stop + delay], f)
+
+    # Euler integration of the production of a protein while the pulse
+    # is on, its trace uses the closed form of the same recursion
+    #   x[s] = a x[s-1] + c u[s],  a = 1 - dt / tau_decay,  c = dt / tau_emit
+    # which is a geometric progression while u is constant.
     def expstep(*, start, stop, tau_emit, tau_decay, delay):
         def f(t, last, dt):
             down = last * dt / tau_decay
             response = start + delay <= t <= stop + delay
             up = response * dt / tau_emit
             return last + up - down
-        return f
-
+        def values(steps):
+            a = 1 - dt / tau_decay
+            c = dt / tau_emit
+            # first and last steps with the pulse on
+            on = first_step(start + delay)
+            off = first_step(np.nextafter(stop + delay, np.inf)) - 1
+            res = np.zeros(len(steps))
+            if off < on:
+                return res
+            during = (on <= steps) & (steps <= off)
+            res[during] = c / (1 - a) * (1 - np.float_power(a, steps[during] - on + 1))
+            top = c / (1 - a) * (1 - np.float_power(a, off - on + 1))
+            after = steps > off
+            res[after] = top * np.float_power(a, steps[after] - off)
+            return res
+        f.derivative = lambda t, x: (start + delay <= t <= stop + delay) / tau_emit - x / tau_decay
+        return Input.signal(('expstep', start, stop, tau_emit, tau_decay, delay), values, [start + delay, stop + delay], f)
+
+    # 0 until at + delay, level after
+    def switch(*, at, level=1, delay=0):
+        return Input.timed(('switch', at, level, delay), lambda t: np.where(t > at + delay, level, 0), [at + delay])
+
+    # count pulses of the given width, one every period, the first one
+    # starting at start + delay (count=None repeats them for ever)
+    def pulses(*, start, width, period, count=None, level=1, delay=0):
+        def at(t):
+            u = t - (start + delay)
+            j = np.floor(u / period)
+            v = u - j * period
+            on = (u > 0) & (v > 0) & (v < width)
+            if count is not None:
+                on &= j < count
+            return np.where(on, level, 0)
+        edges = []
+        if count is not None:
+            edges = [start + delay + j * period + w for j in range(count) for w in (0, width)]
+        return Input.timed(('pulses', start, width, period, count, level, delay), at, edges)
+
+    # Linear interpolation between (times, values), constant outside
+    def piecewise(*, times, values, delay=0):
+        times = tuple(float(t) for t in times)
+        values = tuple(float(v) for v in values)
+        at = lambda t: np.interp(t - delay, times, values)
+        return Input.timed(('piecewise', times, values, delay), at, [t + delay for t in times])
+
+    # From low at start + delay to high at stop + delay
+    def ramp(*, start, stop, low=0, high=1, delay=0):
+        return Input.piecewise(times=[start, stop], values=[low, high], delay=delay)
+
+    # Trace recorded in a csv file, with the times in the first column
+    # and the values in another one (lines that are not numbers, such as
+    # a header, are skipped), interpolated linearly
+    def recorded(path, *, column=1, delay=0):
+        times, values = recording(path, os.path.getmtime(path), column)
+        return Input.piecewise(times=times, values=values, delay=delay)
+
+# A circuit is given by its outputs, every node they depend on (internal
+# gates and inputs) is simulated along with them.
+# keep lists the nodes (or their names) whose trace is stored besides the
+# outputs, None keeps every node. The other nodes are still simulated but
+# only their first step remains in their output.
 class Circuit:
-    def __init__(self, *gates):
+    def __init__(self, *gates, keep=None):
         self.gates = gates
-
-    def run(self, imax, sigma):
-        Random.reset()
-        for t in range(imax):
-            for g in self.gates:
-                g.out(t,sigma)
-
-    def plot(self, tmax):
+        self.keep = keep
+        self.engine = None
+        # one row per kept node, the output of each kept node is a view
+        self.state = None
+        self.kept = None
+
+    def compile(self):
+        if self.engine is None:
+            from engine import Engine
+            self.engine = Engine(self)
+        return self.engine
+
+    # Every node of the circuit, inputs first
+    def nodes(self):
+        return self.compile().nodes
+
+    # Indices into nodes of the kept nodes
+    def rows(self):
+        nodes = self.nodes()
+        if self.keep is None:
+            return np.arange(len(nodes))
+        ids = set(id(n) for n in self.gates)
+        ids.update(id(n) for n in self.keep if isinstance(n, Node))
+        names = set(n for n in self.keep if not isinstance(n, Node))
+        return np.array([i for (i, n) in enumerate(nodes) if id(n) in ids or n.name in names], dtype=int)
+
+    # Make state (one row per kept node) the outputs of the nodes
+    def bind(self, state, rows):
+        nodes = self.nodes()
+        self.state = state
+        self.kept = [nodes[i] for i in rows]
+        for node in nodes:
+            node.attach(np.empty(1))
+        for (node, row) in zip(self.kept, state):
+            node.output = row
+            node.size = state.shape[-1]
+
+    # Trace of a kept node, given as a node or by name
+    def trace(self, node):
+        for (n, row) in zip(self.kept or [], self.state):
+            if n is node or n.name == node:
+                return row
+        raise KeyError("{} is not kept by the circuit".format(getattr(node, 'name', node)))
+
+    # The compiled engine is built on the first run,
+    # compiled=False updates the nodes one by one with Gate.step
+    # Both use the same noise table and give the same results.
+    # Other methods ('rk4', 'adaptive', and 'radau' or 'bdf' for stiff
+    # timers) integrate the noise-free circuit in continuous time, see
+    # integrators.integrate for their options.
+    # Stochastic methods ('em', 'milstein') take sigma per square root of
+    # hour and the noise of the Noise table, see sde.simulate.
+    # Method 'filter' simulates noise-free feed-forward circuits layer by
+    # layer with linear filters, see Engine.filter.
+    # With store, the compiled engine writes the kept nodes to a memory
+    # mapped file chunk steps at a time and resumes an interrupted run,
+    # see store.record. Outputs are then views on the file.
+    def run(self, imax, sigma, compiled=True, method='euler', store=None, chunk=4096, **options):
+        if imax == 0:
+            return
+        engine = self.compile()
+        nodes = engine.nodes
+        rows = self.rows()
+        if store is not None:
+            if method != 'euler' or not compiled:
+                raise ValueError("store needs the compiled euler engine")
+            from store import record
+            self.bind(record(self, imax, sigma, store, chunk).data, rows)
+            return
+        if method in ('em', 'milstein'):
+            from sde import simulate
+            noise = Noise.table(engine.noise_keys, imax)
+            state = simulate(engine, imax, sigma, method, noise=noise, **options)[0]
+            self.bind(state[rows], rows)
+            return
+        if method == 'filter':
+            if sigma != 0:
+                raise ValueError("method filter does not support noise")
+            self.bind(engine.filter(imax)[rows], rows)
+            return
+        if method != 'euler':
+            if sigma != 0:
+                raise ValueError("method {} does not support noise".format(method))
+            from integrators import integrate
+            state = integrate(engine, np.arange(imax) * dt, method, **options)
+            self.bind(state[rows], rows)
+            return
+        noise = Noise.table(engine.noise_keys, imax) if sigma != 0 else None
+        if not compiled:
+            state = np.empty((len(nodes), imax))
+            for (node, row) in zip(nodes, state):
+                node.attach(row)
+            for (i, g) in enumerate(engine.gates):
+                if noise is not None:
+                    g.noise, g.noise_of = noise[i], engine.noise_keys[i]
+            for t in range(1, imax):
+                for node in nodes:
+                    node.step(t, sigma)
+            self.bind(state if self.keep is None else state[rows], rows)
+            return
+        keep = None if self.keep is None else rows
+        self.bind(engine.run(imax, sigma, noise=noise, keep=keep), rows)
+
+    # Simulate chunk steps at a time with the compiled engine, for ever
+    # unless imax is given, see stream.Stream. Nodes keep no output, the
+    # kept rows of each chunk are yielded instead.
+    def stream(self, sigma, chunk=1000, imax=None, history=0):
+        from stream import Stream
+        return Stream(self.compile(), sigma, chunk, self.rows(), imax, history)
+
+    def plot(self, tmax, sigma=0):
+        import matplotlib.pyplot as plt
         imax = int(tmax / dt)
-        self.run(imax)
+        self.run(imax, sigma)
         for g in self.gates:
             plt.plot([i*dt for i in range(imax)], g.output, label=g.name)
         plt.legend()
@@ -0,0 +1,376 @@
+import copy
+
+import numpy as np
+
+from circuit import Combinator, Cutoff, Input, Noise, Schedule, dt, hill_table
+
+# Nodes in the order of the rows of the engine: inputs first, then gates
+# in the order of the schedule
+def layout(outputs, schedule=None):
+    nodes = (schedule or Schedule(outputs)).order
+    return [n for n in nodes if isinstance(n, Input)] + [n for n in nodes if not isinstance(n, Input)]
+
+# Gate parameters of a list of nodes, two circuits with the same
+# signature compile to the same engine up to their inputs
+def signature(nodes):
+    row = { id(n): i for (i, n) in enumerate(nodes) }
+    sig = []
+    for n in nodes:
+        if isinstance(n, Input):
+            sig.append(None)
+            continue
+        c = n.combinator.cutoff
+        sig.append((
+            type(n.combinator), c.ymax, c.ymin, c.k, c.n,
+            n.timer.tau_emit, n.timer.tau_decay, n.initial,
+            tuple(row[id(i)] for i in n.inputs),
+        ))
+    return sig
+
+# Gates that share a combinator type and arity are evaluated together
+class Group:
+    def __init__(self, gates, row):
+        self.combinator = gates[0].combinator
+        self.rows = np.array([row[id(g)] for g in gates])
+        # row of each input in the state vector
+        self.inputs = [
+            np.array([row[id(g.inputs[j])] for g in gates])
+            for j in range(len(gates[0].inputs))
+        ]
+        # Combinators that override response (e.g. Merge) do not go
+        # through the cutoff, their response must work elementwise.
+        self.hill = type(self.combinator).response is Combinator.response
+
+    # Group of the gates selected by mask (indexed by slot), with slots
+    # renumbered according to position
+    def restrict(self, mask, position):
+        keep = mask[self.slots]
+        if not keep.any():
+            return None
+        sub = copy.copy(self)
+        sub.rows = self.rows[keep]
+        sub.slots = position[self.slots[keep]]
+        sub.inputs = [i[keep] for i in self.inputs]
+        return sub
+
+    def activation(self, state):
+        return self.combinator.activation(*[state[..., i] for i in self.inputs])
+
+    def response(self, state):
+        return self.combinator.response(*[state[..., i] for i in self.inputs])
+
+# A circuit compiled into a table of gates
+# - rows of the state are the inputs followed by the gates in topological order
+# - each step updates all gates at once from the previous state
+# - the response of gates whose cutoff has a tol (or all gates if tol is
+#   given here) is interpolated from lookup tables, see Cutoff.tabulated
+class Engine:
+    def __init__(self, circuit, tol=None):
+        schedule = Schedule(circuit.gates)
+        self.nodes = layout(circuit.gates, schedule)
+        # feedback loops, see Schedule
+        self.cycles = schedule.cycles
+        self.inputs = [n for n in self.nodes if isinstance(n, Input)]
+        self.gates = self.nodes[len(self.inputs):]
+        self.row = { id(n): i for (i, n) in enumerate(self.nodes) }
+        kinds = {}
+        for g in self.gates:
+            kinds.setdefault((type(g.combinator), len(g.inputs)), []).append(g)
+        groups = [Group(gs, self.row) for gs in kinds.values()]
+        for grp in groups:
+            # position of the gates in the table of gates
+            grp.slots = grp.rows - len(self.inputs)
+        self.hill_groups = [grp for grp in groups if grp.hill]
+        self.other_groups = [grp for grp in groups if not grp.hill]
+        cutoffs = [g.combinator.cutoff for g in self.gates]
+        self.ymax = np.array([c.ymax for c in cutoffs], dtype=float)
+        self.ymin = np.array([c.ymin for c in cutoffs], dtype=float)
+        self.k = np.array([c.k for c in cutoffs], dtype=float)
+        self.n = np.array([c.n for c in cutoffs], dtype=float)
+        # gates with the same parameters share a table, all tables are
+        # concatenated into values and each gate knows where its own starts
+        tables = {}
+        for (j, c) in enumerate(cutoffs):
+            t = tol if c.tol is None else c.tol
+            if t is not None:
+                tables.setdefault((c.ymax, c.ymin, c.k, c.n, t), []).append(j)
+        self.tabulated = np.array(sorted(j for js in tables.values() for j in js), dtype=int)
+        self.exact = np.setdiff1d(np.arange(len(self.gates)), self.tabulated)
+        start = {}
+        values = []
+        slopes = []
+        size = 0
+        for key in tables:
+            h, ys, clamp = hill_table(*key)
+            start[key] = (size, 1 / h, len(ys) - 1, clamp)
+            values.append(ys)
+            # the slope after the last value is 0
+            slopes.append(np.append(np.diff(ys), 0))
+            size += len(ys)
+        self.values = np.concatenate(values) if values else np.empty(0)
+        self.slopes = np.concatenate(slopes) if slopes else np.empty(0)
+        info = [start[(c.ymax, c.ymin, c.k, c.n, tol if c.tol is None else c.tol)] for c in (cutoffs[j] for j in self.tabulated)]
+        self.offset = np.array([i[0] for i in info], dtype=int)
+        self.inv_step = np.array([i[1] for i in info], dtype=float)
+        self.last = np.array([i[2] for i in info], dtype=int)
+        self.clamp = np.array([i[3] for i in info], dtype=bool)
+        self.all_clamp = self.clamp.all()
+        self.tau_emit = np.array([g.timer.tau_emit for g in self.gates], dtype=float)
+        self.tau_decay = np.array([g.timer.tau_decay for g in self.gates], dtype=float)
+        self.initial = np.array([g.initial for g in self.gates], dtype=float)
+        # row of each gate in the tables of Noise
+        self.noise_keys = Noise.keys(self.gates)
+        # rows of the state updated by run
+        self.rows = np.arange(len(self.inputs), len(self.nodes))
+        self.partial = False
+
+    # Same engine that only updates the gates selected by mask (one
+    # boolean per gate), the other rows are read from the state given
+    # to run
+    def restrict(self, mask):
+        mask = np.asarray(mask, dtype=bool)
+        position = np.cumsum(mask) - 1
+        sub = copy.copy(self)
+        sub.gates = [g for (g, m) in zip(self.gates, mask) if m]
+        sub.rows = self.rows[mask]
+        sub.noise_keys = tuple(k for (k, m) in zip(self.noise_keys, mask) if m)
+        sub.partial = True
+        for attr in ['ymax', 'ymin', 'k', 'n', 'tau_emit', 'tau_decay', 'initial']:
+            setattr(sub, attr, getattr(self, attr)[..., mask])
+        sub.exact = position[self.exact[mask[self.exact]]]
+        tabulated = mask[self.tabulated]
+        sub.tabulated = position[self.tabulated[tabulated]]
+        for attr in ['offset', 'inv_step', 'last', 'clamp']:
+            setattr(sub, attr, getattr(self, attr)[tabulated])
+        sub.all_clamp = sub.clamp.all()
+        sub.hill_groups = [g for g in (grp.restrict(mask, position) for grp in self.hill_groups) if g]
+        sub.other_groups = [g for g in (grp.restrict(mask, position) for grp in self.other_groups) if g]
+        return sub
+
+    # Same engine with the cutoff parameters of the gates replaced by
+    # arrays of shape (batch, len(gates)), one row per variant of a batched
+    # run. All responses are then computed exactly.
+    def assign(self, ymax, ymin, k, n):
+        sub = copy.copy(self)
+        sub.ymax, sub.ymin, sub.k, sub.n = ymax, ymin, k, n
+        sub.exact = np.arange(len(self.gates))
+        sub.tabulated = np.empty(0, dtype=int)
+        return sub
+
+    # An engine compiles to itself, so that analyses take a circuit or an
+    # engine alike
+    def compile(self):
+        return self
+
+    # Highest level of every gate, where production at ymax balances decay
+    def highest(self):
+        return np.clip(self.ymax * self.tau_decay / self.tau_emit, 0, 1000)
+
+    # Gates fed (directly or not) by the given rows, as a mask over gates
+    def downstream(self, rows):
+        children = {}
+        for (j, g) in enumerate(self.gates):
+            for i in g.inputs:
+                children.setdefault(self.row[id(i)], []).append(j)
+        mask = np.zeros(len(self.gates), dtype=bool)
+        stack = list(rows)
+        while stack:
+            for j in children.get(stack.pop(), []):
+                if not mask[j]:
+                    mask[j] = True
+                    stack.append(self.rows[j])
+        return mask
+
+    # Exact cutoff of the selected gates, with arrays of parameters
+    def cutoff(self, slots):
+        return Cutoff(ymax=self.ymax[..., slots], ymin=self.ymin[..., slots], k=self.k[..., slots], n=self.n[..., slots])
+
+    # Cutoff.steady_state_clamp of every gate at once
+    def steady_state(self, x):
+        x = np.maximum(x, 0)
+        if not len(self.tabulated):
+            y = self.cutoff(slice(None)).steady_state(x)
+        else:
+            y = np.empty_like(x)
+            e = self.exact
+            y[..., e] = self.cutoff(e).steady_state(x[..., e])
+            y[..., self.tabulated] = self.lookup(x[..., self.tabulated])
+        return np.where((0 < y) & (y < 100), y, 0)
+
+    # Linear interpolation in the tables of the tabulated gates
+    def lookup(self, x):
+        u = x * self.inv_step
+        v = np.minimum(u, self.last)
+        i = v.astype(np.intp)
+        i += self.offset
+        y = self.values[i] + self.slopes[i] * (v - (i - self.offset))
+        # past the end of tables that do not reach ymin
+        if not self.all_clamp:
+            over = (u > self.last) & ~self.clamp
+            if over.any():
+                j = self.tabulated[np.nonzero(over)[-1]]
+                y[over] = self.cutoff(j).steady_state(x[over])
+        return y
+
+    # Response of every gate for states of shape (..., len(nodes))
+    def response(self, state):
+        # activation of gates without a cutoff is left at 0
+        activation = np.zeros(state.shape[:-1] + (len(self.gates),))
+        for grp in self.hill_groups:
+            activation[..., grp.slots] = grp.activation(state)
+        response = self.steady_state(activation)
+        for grp in self.other_groups:
+            response[..., grp.slots] = grp.response(state)
+        return response
+
+    # Values of the input signals, one row per input, vectorized signals
+    # are computed as whole arrays
+    # With start > 0 only steps from start are computed, last holds the
+    # value of each input at step start - 1.
+    def signals(self, imax, inputs=None, start=0, last=None):
+        inputs = self.inputs if inputs is None else inputs
+        res = np.empty((len(inputs), imax - start))
+        for (i, inp) in enumerate(inputs):
+            if hasattr(inp.ind, 'trace'):
+                res[i] = inp.ind.trace(imax, start)
+                continue
+            if start == 0:
+                prev = inp.ind(0, 0, dt)
+                res[i, 0] = prev
+            else:
+                prev = last[i]
+            for t in range(max(start, 1), imax):
+                prev = inp.ind(t * dt, prev, dt)
+                res[i, t - start] = prev
+        return res
+
+    # Simulate imax steps, returns an array of shape (len(nodes), imax)
+    # A batch of variants that share the gates but not the input signals
+    # is simulated by passing signals of shape (batch, len(inputs), imax),
+    # sigma is then either a scalar or one value per variant and the
+    # result has shape (batch, len(nodes), imax).
+    # noise holds standard normal samples of shape (len(gates), imax), or
+    # (batch, len(gates), imax) to give each variant its own noise:
+    # noise[..., t] is scaled by sigma and added at step t.
+    # By default all variants share the cached table of Noise.
+    # The result is written to out when given, an array of the same shape.
+    # With start > 1 the simulation resumes from the steps already in out,
+    # whose input rows must then be filled for all steps.
+    # keep selects the rows (indices into nodes) that are stored, the
+    # result (and out) then has len(keep) rows instead of len(nodes).
+    def run(self, imax, sigma, signals=None, noise=None, out=None, start=1, keep=None):
+        if out is not None:
+            batched = out.ndim == 3
+            nb = len(out) if batched else 1
+        else:
+            batched = signals is not None
+            nb = len(signals) if batched else 1
+        sigma = np.reshape(sigma, (-1, 1))
+        if noise is None and np.any(sigma != 0):
+            noise = Noise.table(self.noise_keys, imax)
+        if noise is not None:
+            noise = np.reshape(noise, (-1, len(self.gates), imax))
+        ni = len(self.inputs)
+        if keep is not None:
+            if start != 1 or self.partial:
+                raise ValueError("keep needs a full run from the first step")
+            return self.run_kept(imax, sigma, signals, noise, out, np.asarray(keep, dtype=int), batched, nb)
+        state = np.empty((nb, len(self.nodes), imax)) if out is None else out.reshape(nb, len(self.nodes), imax)
+        if start == 1:
+            state[:, :ni] = self.signals(imax) if signals is None else signals
+            state[:, self.rows, 0] = self.initial
+        # the current step is kept contiguous, history is written column by column
+        cur = state[:, :, start-1].copy()
+        for t in range(start, imax):
+            response = self.response(cur)
+            prev = cur[:, self.rows]
+            # solve differential equation accounting for both decay and production
+            nxt = prev + response * dt / self.tau_emit - prev * dt / self.tau_decay
+            if noise is not None:
+                nxt += noise[:, :, t] * sigma
+            if self.partial:
+                state[:, self.rows, t] = np.clip(nxt, 0, 1000)
+                cur = state[:, :, t].copy()
+            else:
+                cur[:, :ni] = state[:, :ni, t]
+                cur[:, ni:] = np.clip(nxt, 0, 1000)
+                state[:, :, t] = cur
+        return state if batched else state[0]
+
+    # Same as run, only the rows in keep are stored
+    def run_kept(self, imax, sigma, signals, noise, out, keep, batched, nb):
+        ni = len(self.inputs)
+        signals = self.signals(imax) if signals is None else signals
+        signals = np.broadcast_to(signals, (nb, ni, imax))
+        state = np.empty((nb, len(keep), imax)) if out is None else out.reshape(nb, len(keep), imax)
+        cur = np.empty((nb, len(self.nodes)))
+        cur[:, :ni] = signals[:, :, 0]
+        cur[:, ni:] = self.initial
+        state[:, :, 0] = cur[:, keep]
+        if noise is not None:
+            noise = noise[:, :, 1:]
+        self.advance(cur, signals[:, :, 1:], sigma, noise, state[:, :, 1:], keep)
+        return state if batched else state[0]
+
+    # Advance the full state cur, of shape (batch, len(nodes)), over as
+    # many steps as there are columns in signals (batch, len(inputs), L)
+    # and noise (batch, len(gates), L). The rows keep of every step are
+    # written to out (batch, len(keep), L), cur is updated in place.
+    def advance(self, cur, signals, sigma, noise, out, keep):
+        ni = len(self.inputs)
+        for t in range(signals.shape[-1]):
+            response = self.response(cur)
+            prev = cur[:, ni:]
+            # solve differential equation accounting for both decay and production
+            nxt = prev + response * dt / self.tau_emit - prev * dt / self.tau_decay
+            if noise is not None:
+                nxt += noise[:, :, t] * sigma
+            cur[:, :ni] = signals[:, :, t]
+            cur[:, ni:] = np.clip(nxt, 0, 1000)
+            out[:, :, t] = cur[:, keep]
+        return cur
+
+    # Noise-free simulation of a feed-forward circuit, layer by layer
+    # Gates of a layer only read gates of earlier layers, whose whole
+    # trajectories are known, so their responses are computed for all
+    # steps at once. The update of each gate is then the linear filter
+    #   x[t] = a x[t-1] + c response[t],  a = 1 - dt / tau_decay,  c = dt / tau_emit
+    # applied with scipy.signal.lfilter. Results agree with run up to
+    # rounding (the clip to [0, 1000] never binds when a >= 0 and the
+    # result stays below 1000, run is used otherwise).
+    # signals and the result are as for run, without noise.
+    def filter(self, imax, signals=None):
+        from scipy.signal import lfilter
+        if self.cycles:
+            raise ValueError("the filter mode needs a feed-forward circuit")
+        batched = signals is not None
+        ni = len(self.inputs)
+        a = 1 - dt / self.tau_decay
+        c = dt / self.tau_emit
+        if (a < 0).any():
+            return self.run(imax, 0, signals)
+        signals = self.signals(imax) if signals is None else signals
+        nb = len(signals) if batched else 1
+        state = np.empty((nb, len(self.nodes), imax))
+        state[:, :ni] = signals
+        state[:, ni:, 0] = self.initial
+        # layer 0 holds the inputs, a gate is one layer after its last input
+        level = np.zeros(len(self.nodes), dtype=int)
+        for (j, g) in enumerate(self.gates):
+            level[ni + j] = 1 + max([level[self.row[id(i)]] for i in g.inputs], default=0)
+        view = state.swapaxes(1, 2)
+        for layer in range(1, level.max() + 1):
+            mask = level[ni:] == layer
+            sub = self.restrict(mask)
+            # response at step t from the state at step t - 1
+            response = sub.response(view[:, :-1]).swapaxes(1, 2)
+            rows = self.rows[mask]
+            for (ai, ci) in set(zip(a[mask], c[mask])):
+                same = (a[mask] == ai) & (c[mask] == ci)
+                x0 = sub.initial[same][:, np.newaxis]
+                zi = np.broadcast_to(ai * x0, (nb,) + x0.shape)
+                x, _ = lfilter([ci], [1, -ai], response[:, same], axis=-1, zi=zi)
+                state[:, rows[same], 1:] = x
+        if state[:, ni:].max(initial=0) > 1000:
+            return self.run(imax, 0, signals if batched else None)
+        return state if batched else state[0]
@@ -0,0 +1,238 @@
+import heapq
+import re
+
+from circuit import *
+
+# Compiler of Boolean expressions into circuits
+#
+# Expressions use the input names and the operators, by decreasing
+# precedence: ! (not), & and !& (nand), ^ (xor), | and !| (nor), such as
+# "(A & B) & C", "A ^ B" or "!(A | B) !| C".
+#
+# - and, or and xor chains are flattened and rebuilt as balanced trees,
+#   joining the shallowest operands first, which minimizes the depth
+# - equal subexpressions (up to the order of the operands) become a
+#   single gate, shared by all the expressions of a circuit
+# - the gates are lowered to the combinators of a basis:
+#   'all': Not, And, Or, Nand, Nor and Merge
+#   'nor': Not, Nor and Merge only
+#   xor is the Merge of two Nor gates, as in builders.xor
+
+BINARY = { '&': 'and', '!&': 'nand', '^': 'xor', '|': 'or', '!|': 'nor' }
+PRECEDENCE = { 'not': 4, 'and': 3, 'nand': 3, 'xor': 2, 'or': 1, 'nor': 1 }
+TOKEN = re.compile(r"\s*(?:(!\||!&|[&^|!()])|([A-Za-z_][A-Za-z0-9_]*))")
+
+def tokens(text):
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        m = TOKEN.match(text, pos)
+        if m is None:
+            raise ValueError("unexpected {!r} in {!r}".format(text[pos:].strip()[:1], text))
+        pos = m.end()
+        yield m.group(1) or m.group(2)
+
+# Syntax tree of an expression, made of tuples ('var', name), ('not', x)
+# and (op, x, y) for the binary operators
+def parse(text):
+    out = []
+    ops = []
+    def reduce():
+        op = ops.pop()
+        if op == '(':
+            raise ValueError("unbalanced parenthesis in {!r}".format(text))
+        if op == 'not':
+            if not out:
+                raise ValueError("missing operand in {!r}".format(text))
+            out.append(('not', out.pop()))
+        else:
+            if len(out) < 2:
+                raise ValueError("missing operand in {!r}".format(text))
+            y = out.pop()
+            out.append((op, out.pop(), y))
+    operand = True
+    for tok in tokens(text):
+        if operand:
+            if tok == '!':
+                ops.append('not')
+            elif tok == '(':
+                ops.append('(')
+            elif tok in BINARY or tok == ')':
+                raise ValueError("missing operand before {!r} in {!r}".format(tok, text))
+            else:
+                out.append(('var', tok))
+                operand = False
+        else:
+            if tok == ')':
+                while ops and ops[-1] != '(':
+                    reduce()
+                if not ops:
+                    raise ValueError("unbalanced parenthesis in {!r}".format(text))
+                ops.pop()
+            elif tok in BINARY:
+                op = BINARY[tok]
+                # binary operators are left associative
+                while ops and ops[-1] != '(' and PRECEDENCE[ops[-1]] >= PRECEDENCE[op]:
+                    reduce()
+                ops.append(op)
+                operand = True
+            else:
+                raise ValueError("missing operator before {!r} in {!r}".format(tok, text))
+    if operand:
+        raise ValueError("missing operand at the end of {!r}".format(text))
+    while ops:
+        reduce()
+    return out[0]
+
+# Children before parents, without recursion
+def postorder(tree):
+    order = []
+    stack = [(tree, False)]
+    while stack:
+        node, done = stack.pop()
+        if done:
+            order.append(node)
+            continue
+        stack.append((node, True))
+        for child in reversed(node[1:]):
+            if isinstance(child, tuple):
+                stack.append((child, False))
+    return order
+
+# Network of gates shared by the expressions being compiled
+# Signals are the inputs (by name) and the gates (by index in nodes,
+# each one a (combinator type, input signals) pair), depth holds the
+# number of gates between a signal and the inputs.
+class Network:
+    def __init__(self, basis):
+        if basis not in ('all', 'nor'):
+            raise ValueError("unknown basis {}".format(basis))
+        self.basis = basis
+        self.nodes = []
+        self.keys = {}
+        self.depth = {}
+
+    def gate(self, kind, *args):
+        if kind in (And, Or, Nand, Nor, Merge):
+            args = tuple(sorted(args, key=str))
+        key = (kind, args)
+        if key not in self.keys:
+            self.keys[key] = len(self.nodes)
+            self.nodes.append(key)
+            self.depth[len(self.nodes) - 1] = 1 + max(self.depth.get(a, 0) for a in args)
+        return self.keys[key]
+
+    def kind(self, s):
+        return self.nodes[s][0] if isinstance(s, int) else None
+
+    def neg(self, x):
+        # double negations cancel, other negations merge into the gate
+        if self.kind(x) is Not:
+            return self.nodes[x][1][0]
+        if self.basis == 'all':
+            swap = { And: Nand, Nand: And, Or: Nor, Nor: Or }
+            if self.kind(x) in swap:
+                return self.gate(swap[self.kind(x)], *self.nodes[x][1])
+        return self.gate(Not, x)
+
+    def binary(self, op, x, y):
+        if op == 'xor':
+            n = self.gate(Nor, x, y)
+            return self.gate(Merge, self.gate(Nor, n, x), self.gate(Nor, n, y))
+        if self.basis == 'all':
+            return self.gate({ 'and': And, 'or': Or }[op], x, y)
+        if op == 'or':
+            return self.neg(self.gate(Nor, x, y))
+        return self.gate(Nor, self.neg(x), self.neg(y))
+
+    # Balanced tree of an associative operator, shallowest operands first
+    def chain(self, op, args):
+        heap = [(self.depth.get(a, 0), i, a) for (i, a) in enumerate(args)]
+        heapq.heapify(heap)
+        i = len(heap)
+        while len(heap) > 1:
+            x = heapq.heappop(heap)[2]
+            y = heapq.heappop(heap)[2]
+            s = self.binary(op, x, y)
+            heapq.heappush(heap, (self.depth.get(s, 0), i, s))
+            i += 1
+        return heap[0][2]
+
+    # Signal computing a syntax tree
+    def compile(self, tree):
+        value = {}
+        for node in postorder(tree):
+            op = node[0]
+            if op == 'var':
+                value[id(node)] = node[1]
+            elif op == 'not':
+                value[id(node)] = self.neg(self.signal(value[id(node[1])]))
+            elif op in ('and', 'or', 'xor'):
+                # operands of the same operator join the chain
+                args = []
+                for child in node[1:]:
+                    if child[0] == op:
+                        args.extend(value[id(child)][1])
+                    else:
+                        args.append(self.signal(value[id(child)]))
+                if op != 'xor':
+                    args = list(dict.fromkeys(args))
+                value[id(node)] = (op, args)
+            else:
+                x, y = (self.signal(value[id(c)]) for c in node[1:])
+                if op == 'nor':
+                    value[id(node)] = self.gate(Nor, x, y)
+                elif self.basis == 'all':
+                    value[id(node)] = self.gate(Nand, x, y)
+                else:
+                    value[id(node)] = self.neg(self.binary('and', x, y))
+        return self.signal(value[id(tree)])
+
+    # Pending chains are built when their value is used
+    def signal(self, v):
+        if isinstance(v, tuple):
+            return self.chain(*v)
+        return v
+
+SYMBOL = { And: '&', Or: '|', Nand: '!&', Nor: '!|', Merge: '^' }
+
+# Circuit computing expressions, given as a string or as a dict of
+# output names to strings
+# - inputs: signal (such as Input.heaviside(...)) or Input of each input
+#   name, the missing ones are constantly 0
+# - basis: combinators to use, see above
+# - cutoff and timer: called to get the parameters of each gate
+# The circuit is not run.
+def compile_circuit(expressions, inputs=None, basis='all', cutoff=Cutoff.default, timer=Timer.default):
+    if isinstance(expressions, str):
+        expressions = { expressions: expressions }
+    inputs = inputs or {}
+    net = Network(basis)
+    outputs = { name: net.compile(parse(text)) for (name, text) in expressions.items() }
+    # gates replaced by a simplification are dropped
+    live = set(outputs.values())
+    for i in reversed(range(len(net.nodes))):
+        if i in live:
+            live.update(net.nodes[i][1])
+    used = sorted(s for s in live if isinstance(s, str))
+    nodes = {}
+    for name in used:
+        ind = inputs.get(name, Input.switch(at=0, level=0))
+        nodes[name] = ind if isinstance(ind, Input) else Input(name, 'grey', ind)
+    labels = {}
+    for (i, (kind, args)) in enumerate(net.nodes):
+        if i not in live:
+            continue
+        parts = [labels.get(a, a) for a in args]
+        parts = [p if isinstance(a, str) or net.kind(a) is Not else "({})".format(p) for (a, p) in zip(args, parts)]
+        labels[i] = "!" + parts[0] if kind is Not else " {} ".format(SYMBOL[kind]).join(parts)
+        nodes[i] = Gate(labels[i], '', kind(cutoff()), timer(), *[nodes[a] for a in args])
+    gates = []
+    for (name, s) in outputs.items():
+        g = nodes[s]
+        if isinstance(g, Input) or g in gates:
+            # outputs are distinct gates
+            g = Gate(name, '', Same(cutoff()), timer(), g)
+        g.name = name
+        gates.append(g)
+    return Circuit(*[nodes[n] for n in used], *gates)
@@ -0,0 +1,186 @@
+import numpy as np
+
+# Continuous-time view of a compiled circuit
+#   dx/dt = response(inputs) / tau_emit - x / tau_decay
+# The ODE state holds the inputs that integrate their own state
+# (those with a derivative, such as expstep) followed by the gates,
+# the other inputs are evaluated as functions of time.
+class System:
+    def __init__(self, engine):
+        self.engine = engine
+        inds = [n.ind for n in engine.inputs]
+        self.pure = [i for (i, f) in enumerate(inds) if not hasattr(f, 'derivative')]
+        self.smooth = [i for (i, f) in enumerate(inds) if hasattr(f, 'derivative')]
+        self.size = len(self.smooth) + len(engine.gates)
+        self.edges = sorted(set(e for f in inds for e in getattr(f, 'edges', [])))
+
+    def initial(self):
+        return np.concatenate([np.zeros(len(self.smooth)), self.engine.initial])
+
+    # Full state of the nodes at time t
+    def nodes(self, t, y):
+        engine = self.engine
+        ni = len(engine.inputs)
+        state = np.empty(len(engine.nodes))
+        for i in self.pure:
+            state[i] = engine.inputs[i].ind(t, 0, 0)
+        state[self.smooth] = y[:len(self.smooth)]
+        state[ni:] = y[len(self.smooth):]
+        return state
+
+    # Time derivative of y at time t
+    # No input changes strictly inside a step, at the bounds of the
+    # step inputs are evaluated on the inner side of span.
+    def derivative(self, t, y, span):
+        t = min(max(t, np.nextafter(span[0], span[1])), np.nextafter(span[1], span[0]))
+        engine = self.engine
+        res = np.empty(self.size)
+        for (j, i) in enumerate(self.smooth):
+            res[j] = engine.inputs[i].ind.derivative(t, y[j])
+        x = y[len(self.smooth):]
+        res[len(self.smooth):] = engine.response(self.nodes(t, y)) / engine.tau_emit - x / engine.tau_decay
+        return res
+
+    # Same bounds as the Euler engine
+    def clip(self, y):
+        y[len(self.smooth):] = np.clip(y[len(self.smooth):], 0, 1000)
+        return y
+
+def rk4_step(f, t, y, h, span):
+    k1 = f(t, y, span)
+    k2 = f(t + h/2, y + h/2 * k1, span)
+    k3 = f(t + h/2, y + h/2 * k2, span)
+    k4 = f(t + h, y + h * k3, span)
+    return y + h/6 * (k1 + 2*k2 + 2*k3 + k4), k1
+
+# Dormand-Prince 5(4) tableau
+DOPRI_C = [0, 1/5, 3/10, 4/5, 8/9, 1, 1]
+DOPRI_A = [
+    [],
+    [1/5],
+    [3/40, 9/40],
+    [44/45, -56/15, 32/9],
+    [19372/6561, -25360/2187, 64448/6561, -212/729],
+    [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656],
+    [35/384, 0, 500/1113, 125/192, -2187/6784, 11/84],
+]
+DOPRI_E = np.array([71/57600, 0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40])
+
+# One Dormand-Prince step, returns the 5th order solution, the error
+# estimate and the derivatives at both ends
+def dopri_step(f, t, y, h, span):
+    k = []
+    for (c, a) in zip(DOPRI_C, DOPRI_A):
+        yi = y + h * sum(aj * kj for (aj, kj) in zip(a, k)) if k else y
+        k.append(f(t + c*h, yi, span))
+    y1 = y + h * sum(aj * kj for (aj, kj) in zip(DOPRI_A[-1], k))
+    err = h * sum(e * kj for (e, kj) in zip(DOPRI_E, k))
+    return y1, err, k[0], k[-1]
+
+# Cubic Hermite interpolation of the accepted steps onto times
+def resample(ts, ys, f0s, f1s, times):
+    ts = np.array(ts)
+    idx = np.clip(np.searchsorted(ts, times, side='right') - 1, 0, len(ts) - 2)
+    t0 = ts[idx]
+    h = ts[idx + 1] - t0
+    s = ((times - t0) / h)[:, np.newaxis]
+    y0 = np.array(ys)[idx]
+    y1 = np.array(ys)[idx + 1]
+    f0 = np.array(f0s)[idx] * h[:, np.newaxis]
+    f1 = np.array(f1s)[idx] * h[:, np.newaxis]
+    return (
+        (2*s**3 - 3*s**2 + 1) * y0 + (s**3 - 2*s**2 + s) * f0
+        + (-2*s**3 + 3*s**2) * y1 + (s**3 - s**2) * f1
+    )
+
+# Implicit integration with scipy.integrate.solve_ivp (method 'Radau' or
+# 'BDF') from one input edge to the next, sampled at times by the dense
+# output of each segment. Returns an array of shape (len(times), system.size).
+def implicit(system, times, method, rtol, atol, max_step):
+    from scipy.integrate import solve_ivp
+    f = system.derivative
+    stops = [e for e in system.edges if times[0] < e < times[-1]] + [times[-1]]
+    t = times[0]
+    y = system.initial()
+    res = np.empty((len(times), system.size))
+    res[times <= t] = y
+    for stop in stops:
+        span = (t, stop)
+        if stop > t:
+            sol = solve_ivp(lambda s, x: f(s, x, span), span, y, method=method,
+                            rtol=rtol, atol=atol, max_step=max_step, dense_output=True)
+            if not sol.success:
+                raise RuntimeError(sol.message)
+            inside = (times > t) & (times <= stop)
+            if inside.any():
+                res[inside] = system.clip(sol.sol(times[inside]).T)
+            y = system.clip(sol.y[:, -1].copy())
+        t = stop
+    return res
+
+# Integrate a compiled circuit and sample it at the given times
+# - method 'rk4' uses fixed steps of size h (but never steps over an edge)
+# - method 'adaptive' uses Dormand-Prince with error control (rtol, atol),
+#   steps are at most max_step and stop exactly at input edges
+# - methods 'radau' and 'bdf' are implicit, for stiff circuits (time
+#   constants much shorter than the times of interest) where the explicit
+#   methods need steps of the order of the shortest time constant, see
+#   implicit
+# Returns an array of shape (len(nodes), len(times)).
+def integrate(engine, times, method='rk4', h=0.1, rtol=1e-6, atol=1e-9, max_step=np.inf):
+    system = System(engine)
+    ni = len(engine.inputs)
+    if method in ('radau', 'bdf'):
+        y = implicit(system, np.asarray(times, dtype=float), {'radau': 'Radau', 'bdf': 'BDF'}[method], rtol, atol, max_step)
+        return sample(engine, system, times, y)
+    f = system.derivative
+    t_end = times[-1]
+    stops = [e for e in system.edges if times[0] < e < t_end] + [t_end]
+    t = times[0]
+    y = system.initial()
+    ts, ys, f0s, f1s = [t], [y], [], []
+    step = h if method == 'rk4' else min(h, max_step)
+    for stop in stops:
+        span = (t, stop)
+        while t < stop:
+            step = min(step, stop - t)
+            if method == 'rk4':
+                y1, f0 = rk4_step(f, t, y, step, span)
+            elif method == 'adaptive':
+                y1, err, f0, _ = dopri_step(f, t, y, step, span)
+                scale = atol + rtol * np.maximum(np.abs(y), np.abs(y1))
+                norm = np.sqrt(np.mean((err / scale) ** 2)) if len(y) else 0
+                factor = min(5, max(0.2, 0.9 * norm ** -0.2)) if norm > 0 else 5
+                if norm > 1:
+                    step *= factor
+                    continue
+            else:
+                raise ValueError("unknown integration method {}".format(method))
+            t1 = stop if stop - t - step < 1e-12 * max(1, abs(stop)) else t + step
+            y = system.clip(y1)
+            f0s.append(f0)
+            f1s.append(f(t1, y, span))
+            t = t1
+            ts.append(t)
+            ys.append(y)
+            if method == 'adaptive':
+                step = min(step * factor, max_step)
+            else:
+                step = h
+    if len(ts) < 2:
+        state = np.empty((len(engine.nodes), len(times)))
+        state[ni:] = engine.initial[:, np.newaxis]
+        state[:ni] = engine.signals(len(times))
+        return state
+    return sample(engine, system, times, resample(ts, ys, f0s, f1s, times))
+
+# State of the nodes, shape (len(nodes), len(times)), from the ODE state y
+# at times, shape (len(times), system.size)
+def sample(engine, system, times, y):
+    ni = len(engine.inputs)
+    state = np.empty((len(engine.nodes), len(times)))
+    for i in system.pure:
+        state[i] = [engine.inputs[i].ind(t, 0, 0) for t in times]
+    state[system.smooth] = y[:, :len(system.smooth)].T
+    state[ni:] = y[:, len(system.smooth):].T
+    return state
@@ -0,0 +1,84 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from engine import Engine
+from sde import simulate
+
+# Simulate one chunk of noisy replicates
+# Each replicate draws its noise from its own seed, so that the result
+# does not depend on how replicates are distributed among workers.
+# The chunk is reduced before being sent back: the sum of its traces and
+# the number of replicates whose logical level (above threshold or not)
+# differs from the one of the noise-free reference, and the traces
+# themselves only if keep (for percentiles).
+def replicate_chunk(builder, kwargs, imax, sigma, seeds, sde, threshold, keep):
+    engine = Engine(builder(imax=0, sigma=0, **kwargs))
+    noise = np.stack([
+        np.random.default_rng(s).standard_normal((len(engine.gates), imax))
+        for s in seeds
+    ])
+    if sde is not None:
+        traces = simulate(engine, imax, sigma, noise=noise, **sde)
+    else:
+        signals = engine.signals(imax)
+        signals = np.broadcast_to(signals, (len(seeds),) + signals.shape)
+        traces = engine.run(imax, sigma, signals, noise)
+    level = engine.run(imax, 0) > threshold
+    failures = ((traces > threshold) != level).sum(axis=0)
+    return traces.sum(axis=0), failures, traces if keep else None
+
+# Statistics of n noisy replicates, each trace has shape (n_nodes, imax)
+# - reference: the noise-free trajectory
+# - mean: average over replicates
+# - percentiles: one trace per requested percentile
+# - failure: probability that the logical level (above threshold or not)
+#   differs from the one of the reference
+class MonteCarlo:
+    def __init__(self, names, reference, n, total, failures, traces, percentiles):
+        self.names = names
+        self.reference = reference
+        self.mean = total / n
+        self.percentiles = dict(zip(percentiles, np.percentile(traces, percentiles, axis=0))) if len(percentiles) else {}
+        self.failure = failures / n
+
+    def row(self, name):
+        return self.names.index(name)
+
+# Run n noisy replicates of the circuit produced by builder
+# - builder and kwargs are the same as for sweep.sweep and must be
+#   picklable, i.e. defined at the top level of a module such as builders
+# - seed is the master seed, the result only depends on it and not on
+#   the number of workers (None: as many as cores) or on chunk (up to
+#   rounding for the mean, which is summed chunk by chunk)
+# - percentiles: requested percentiles, which need every trace in memory
+#   at once, none by default
+# - sde selects the stochastic solver instead of the Euler engine, as a
+#   dict of options of sde.simulate such as {'method': 'em', 'step': 10}
+def montecarlo(builder, n, *, imax, sigma, seed=None, workers=None, chunk=32,
+               threshold=0.5, percentiles=(), sde=None, **kwargs):
+    seeds = np.random.SeedSequence(seed).spawn(n)
+    chunks = [seeds[i:i+chunk] for i in range(0, n, chunk)]
+    args = (
+        itertools.repeat(builder),
+        itertools.repeat(kwargs),
+        itertools.repeat(imax),
+        itertools.repeat(sigma),
+        chunks,
+        itertools.repeat(sde),
+        itertools.repeat(threshold),
+        itertools.repeat(len(percentiles) > 0),
+    )
+    if workers == 1:
+        parts = list(map(replicate_chunk, *args))
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            parts = list(pool.map(replicate_chunk, *args))
+    engine = Engine(builder(imax=0, sigma=0, **kwargs))
+    reference = engine.run(imax, 0)
+    names = [node.name for node in engine.nodes]
+    total = sum(p[0] for p in parts)
+    failures = sum(p[1] for p in parts)
+    traces = np.concatenate([p[2] for p in parts]) if len(percentiles) else None
+    return MonteCarlo(names, reference, n, total, failures, traces, percentiles)
@@ -1,36 +1,9 @@
 from circuit import *
-
-# DNA-binding proteins
-class RealNor(Gate):
-    def __init__(self, name, color, *inputs):
-        super().__init__(name, color, Nor(Cutoff.default()), Timer(emit=36/60,decay=35/60), *inputs)
-
-# CRISPRi
-class RealNorCRISPRi(Gate):
-    def __init__(self, name, color, *inputs):
-        super().__init__(name, color, Nor(Cutoff.default()), Timer(emit=35/60,decay=47/60), *inputs)
-
-
-def real_nor(*, delay_ab, imax, start, pulse_a, pulse_b, mecanism='protein'):
-    f = lambda pulse, delay: Input.heaviside(
-            start=start,
-            stop=start + pulse,
-            delay=delay,
-        )
-    a = Input("A", 'grey', f(pulse_a, 0))
-    b = Input("B", 'darkgrey', f(pulse_b, delay_ab))
-    if mecanism == 'protein':
-        a_b_nor = RealNor("A NOR B", 'red',a,b)
-    if mecanism == 'crispri':
-        a_b_nor = RealNorCRISPRi("A NOR B", 'red',a,b)
-    c = Circuit(
-        a, b,
-        a_b_nor
-    )
-    c.run(imax, sigma=0)
-    return c
+from builders import RealNor, RealNorCRISPRi, real_nor
 
 if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
     pulse = 3
     start = 5
     tmax = 20
@@ -0,0 +1,82 @@
+import numpy as np
+
+from circuit import dt
+
+# Stochastic version of the gate equations
+#   dx = (response(inputs) / tau_emit - x / tau_decay) dt + g(x) dW
+# where W is a standard Wiener process and the diffusion g(x) is
+# - 'additive': sigma
+# - 'multiplicative': sigma * x
+# sigma is per square root of hour. The Euler engine adds sigma * N(0, 1)
+# per step instead, which corresponds to sigma / sqrt(dt) here.
+#
+# Wiener increments always come from a Brownian path sampled at dt, a
+# coarse step of step * dt uses the sum of the increments it covers.
+# Runs at different steps are therefore driven by the same path and
+# their statistics agree.
+
+# Milstein correction g * g' / 2 * (dW^2 - h)
+def milstein(diffusion, sigma, x, dw, h):
+    if diffusion == 'additive':
+        return 0
+    return 0.5 * sigma * sigma * x * (dw * dw - h)
+
+def diffuse(diffusion, sigma, x):
+    if diffusion == 'additive':
+        return sigma
+    if diffusion == 'multiplicative':
+        return sigma * x
+    raise ValueError("unknown diffusion {}".format(diffusion))
+
+# Simulate noisy replicates of a compiled circuit
+# - method: 'em' (Euler-Maruyama) or 'milstein', both coincide for
+#   additive noise
+# - step: number of dt covered by one integration step
+# - noise: standard normal samples of shape (replicates, len(gates), imax)
+#   whose column t drives step t of the Brownian path (column 0 is unused),
+#   drawn from np.random.default_rng(seed) when not given
+# Returns an array of shape (replicates, len(nodes), imax), sampled every
+# dt (gates are interpolated linearly between integration steps).
+def simulate(engine, imax, sigma, method='em', step=1, diffusion='additive',
+             noise=None, replicates=1, seed=None):
+    if method not in ('em', 'milstein'):
+        raise ValueError("unknown SDE method {}".format(method))
+    ni = len(engine.inputs)
+    ng = len(engine.gates)
+    if noise is None:
+        noise = np.random.default_rng(seed).standard_normal((replicates, ng, imax))
+    noise = np.reshape(noise, (-1, ng, imax))
+    nr = len(noise)
+    # Brownian path at every dt
+    path = np.zeros((nr, ng, imax))
+    np.cumsum(noise[:, :, 1:] * np.sqrt(dt), axis=-1, out=path[:, :, 1:])
+    # integration steps, the last one may be shorter
+    bounds = np.array(list(range(0, imax - 1, step)) + [imax - 1])
+    signals = engine.signals(imax)
+    coarse = np.empty((nr, ng, len(bounds)))
+    cur = np.empty((nr, len(engine.nodes)))
+    cur[:, :ni] = signals[:, 0]
+    cur[:, ni:] = engine.initial
+    coarse[..., 0] = cur[:, ni:]
+    for j in range(1, len(bounds)):
+        a, b = bounds[j-1], bounds[j]
+        h = (b - a) * dt
+        dw = path[..., b] - path[..., a]
+        x = cur[:, ni:]
+        drift = engine.response(cur) / engine.tau_emit - x / engine.tau_decay
+        nxt = x + drift * h + diffuse(diffusion, sigma, x) * dw
+        if method == 'milstein':
+            nxt += milstein(diffusion, sigma, x, dw, h)
+        cur[:, :ni] = signals[:, b]
+        cur[:, ni:] = np.clip(nxt, 0, 1000)
+        coarse[..., j] = cur[:, ni:]
+    state = np.empty((nr, len(engine.nodes), imax))
+    state[:, :ni] = signals
+    if len(bounds) < 2:
+        state[:, ni:] = coarse
+        return state
+    i = np.arange(imax)
+    j = np.clip(np.searchsorted(bounds, i, side='right') - 1, 0, len(bounds) - 2)
+    w = (i - bounds[j]) / (bounds[j+1] - bounds[j])
+    state[:, ni:] = coarse[..., j] * (1 - w) + coarse[..., j+1] * w
+    return state
@@ -0,0 +1,151 @@
+import numpy as np
+
+from circuit import Noise, dt
+
+# Forward-mode sensitivities of a simulation to the parameters of the gates
+#
+# Along with the state x, every step propagates its derivatives S = dx/dp
+# with respect to the parameters p: ymax, ymin, k, n, tau_emit and
+# tau_decay of every gate, by differentiating the update of Engine.run
+#   x' = clip(x + r dt / tau_emit - x dt / tau_decay + noise, 0, 1000)
+#   S' = S + dr dt / tau_emit - S dt / tau_decay
+#        - r dt / tau_emit^2 (for p = tau_emit) + x dt / tau_decay^2 (for p = tau_decay)
+# (0 where the clip binds). dr sums the derivative of the Hill function
+# with respect to its own parameters and, through the activation, the
+# derivatives of the inputs of the gate. Activations (and the responses
+# of combinators without cutoff, such as Merge) are affine in each input,
+# so their partial derivatives are differences of the activation with
+# that input at 1 and 0. Gates without cutoff have no derivative with
+# respect to the Hill parameters.
+# Responses are computed exactly, also for tabulated cutoffs.
+# One pass costs about 6 len(gates) times a plain run, the cost of the
+# finite differences but without their truncation errors.
+
+PARAMS = ('ymax', 'ymin', 'k', 'n', 'tau_emit', 'tau_decay')
+
+# Response r of the gates with a cutoff, dr/da and dr/dp of their Hill
+# function, for activations a of shape (len(gates),)
+def hill(engine, a):
+    a = np.maximum(a, 0)
+    ymax, ymin, k, n = engine.ymax, engine.ymin, engine.k, engine.n
+    u = np.float_power(a / k, n)
+    h = ymin + (ymax - ymin) / (1 + u)
+    # clamped responses are constant
+    live = (0 < h) & (h < 100)
+    q = (ymax - ymin) * u / (1 + u) ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        da = np.where(a > 0, -q * n / a, 0)
+        dn = np.where(a > 0, -q * np.log(a / k), 0)
+    partials = [1 / (1 + u), u / (1 + u), q * n / k, dn]
+    return np.where(live, h, 0), np.where(live, da, 0), [np.where(live, d, 0) for d in partials]
+
+# Result of run
+# - names: names of the kept nodes
+# - params: (parameter, gate name) of each column of the derivatives
+# - trace: kept trajectories, shape (len(names), imax)
+# - grad: their derivatives, shape (len(names), imax, len(params))
+class Sensitivity:
+    def __init__(self, names, params, trace, grad):
+        self.names = names
+        self.params = params
+        self.trace = trace
+        self.grad = grad
+
+    # Value and derivatives of the trajectory at a step of each node
+    def at(self, steps):
+        rows = np.arange(len(self.names))
+        return self.trace[rows, steps], self.grad[rows, steps]
+
+    def final(self):
+        return self.at(np.full(len(self.names), self.trace.shape[-1] - 1))
+
+    # The peak moves with the parameters, its derivative is the one of
+    # the trajectory at the step of the peak
+    def peak(self):
+        return self.at(np.argmax(self.trace, axis=-1))
+
+    def overshoot(self):
+        (p, dp), (f, df) = self.peak(), self.final()
+        up = (p > f)[:, np.newaxis]
+        return np.maximum(p - f, 0), np.where(up, dp - df, 0)
+
+    # Derivatives of values of shape (len(names), len(params)) as a dict
+    # of (parameter, gate name) to the derivatives of each node
+    def by_param(self, grad):
+        return { p: grad[:, i] for (i, p) in enumerate(self.params) }
+
+# Simulate a circuit (or Engine) for imax steps with the derivatives of
+# the kept nodes (all nodes by default, or the rows of keep) with respect
+# to the parameters in params (any of PARAMS) of every gate. The input
+# signals are those of Engine.run, noise has shape (len(gates), imax).
+def run(circuit, imax, sigma=0, params=PARAMS, keep=None, noise=None):
+    engine = circuit.compile()
+    if engine.partial:
+        raise ValueError("sensitivities need a full engine")
+    ni = len(engine.inputs)
+    ng = len(engine.gates)
+    keep = np.arange(len(engine.nodes)) if keep is None else np.asarray(keep, dtype=int)
+    column = { p: i for (i, p) in enumerate(params) }
+    nparams = len(params) * ng
+    gates = np.arange(ng)
+    signals = engine.signals(imax)
+    if noise is None and sigma != 0:
+        noise = Noise.table(engine.noise_keys, imax)
+    # every input of every group: (group, position of the input, its rows)
+    links = []
+    for grp in engine.hill_groups + engine.other_groups:
+        for (j, rows) in enumerate(grp.inputs):
+            links.append((grp, j, rows))
+
+    def slope(grp, j, state, f):
+        hi = [state[i] for i in grp.inputs]
+        lo = list(hi)
+        hi[j] = np.ones(len(grp.slots))
+        lo[j] = np.zeros(len(grp.slots))
+        return f(*hi) - f(*lo)
+
+    hill_slots = np.concatenate([grp.slots for grp in engine.hill_groups] + [np.empty(0, dtype=int)])
+    cur = np.empty(len(engine.nodes))
+    cur[:ni] = signals[:, 0]
+    cur[ni:] = engine.initial
+    sens = np.zeros((len(engine.nodes), nparams))
+    trace = np.empty((len(keep), imax))
+    grad = np.empty((len(keep), imax, nparams))
+    trace[:, 0] = cur[keep]
+    grad[:, 0] = sens[keep]
+    for t in range(1, imax):
+        activation = np.zeros(ng)
+        for grp in engine.hill_groups:
+            activation[grp.slots] = grp.activation(cur)
+        r, dr_da, partials = hill(engine, activation)
+        dr = np.zeros((ng, nparams))
+        for grp in engine.other_groups:
+            r[grp.slots] = grp.response(cur)
+        for (grp, j, rows) in links:
+            if grp.hill:
+                coef = dr_da[grp.slots] * slope(grp, j, cur, grp.combinator.activation)
+            else:
+                coef = slope(grp, j, cur, grp.combinator.response)
+            dr[grp.slots] += coef[:, np.newaxis] * sens[rows]
+        for (name, d) in zip(PARAMS, partials):
+            if name in column:
+                dr[hill_slots, column[name] * ng + hill_slots] += d[hill_slots]
+        prev = cur[ni:]
+        sg = sens[ni:]
+        nxt = prev + r * dt / engine.tau_emit - prev * dt / engine.tau_decay
+        if noise is not None:
+            nxt += noise[:, t] * sigma
+        sg = sg + dr * (dt / engine.tau_emit)[:, np.newaxis] - sg * (dt / engine.tau_decay)[:, np.newaxis]
+        if 'tau_emit' in column:
+            sg[gates, column['tau_emit'] * ng + gates] -= r * dt / engine.tau_emit ** 2
+        if 'tau_decay' in column:
+            sg[gates, column['tau_decay'] * ng + gates] += prev * dt / engine.tau_decay ** 2
+        sg[(nxt < 0) | (nxt > 1000)] = 0
+        cur[:ni] = signals[:, t]
+        cur[ni:] = np.clip(nxt, 0, 1000)
+        sens[ni:] = sg
+        trace[:, t] = cur[keep]
+        grad[:, t] = sens[keep]
+    names = [engine.nodes[i].name for i in keep]
+    labels = [(p, g.name) for p in params for g in engine.gates]
+    return Sensitivity(names, labels, trace, grad)
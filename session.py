@@ -0,0 +1,70 @@
+import numpy as np
+
+from circuit import Noise
+from engine import Engine, layout, signature
+
+# Keeps the trajectories of a circuit between parameter updates
+# Each update rebuilds the circuit with builder (with imax=0, so that it
+# is not simulated) and compares its input signals with the previous
+# ones. Only the gates downstream of a changed input are recomputed, and
+# only from the first step where one of their inputs differs.
+# A change of sigma or of the gates themselves falls back to a full run.
+class Session:
+    def __init__(self, builder, *, imax, **params):
+        self.builder = builder
+        self.imax = imax
+        self.params = {}
+        self.engine = None
+        self.state = None
+        self.circuit = None
+        self.update(**params)
+
+    # Rebuild the circuit with some parameters changed, returns the new
+    # circuit whose outputs are views on the session state
+    def update(self, **params):
+        params = dict(self.params, **params)
+        circuit = self.builder(imax=0, **params)
+        nodes = layout(circuit.gates)
+        sigma = params.get("sigma", 0)
+        imax = self.imax
+        full = (
+            self.engine is None
+            or sigma != self.params.get("sigma", 0)
+            or signature(nodes) != self.signature
+        )
+        if full:
+            self.engine = Engine(circuit)
+            self.signature = signature(nodes)
+            self.state = np.empty((len(nodes), imax))
+            self.engine.run(imax, sigma, noise=self.noise(sigma), out=self.state)
+        else:
+            self.resume(nodes, sigma)
+        self.params = params
+        for (node, row) in zip(nodes, self.state):
+            node.output = row
+            node.size = imax
+        circuit.state = self.state
+        circuit.kept = nodes
+        self.circuit = circuit
+        return circuit
+
+    def noise(self, sigma):
+        return Noise.table(self.engine.noise_keys, self.imax) if sigma != 0 else None
+
+    # Recompute what depends on the inputs that changed
+    def resume(self, nodes, sigma):
+        ni = len(self.engine.inputs)
+        signals = self.engine.signals(self.imax, nodes[:ni])
+        changed = (signals != self.state[:ni]).any(axis=1)
+        if not changed.any():
+            return
+        # gates read their inputs from the previous step
+        start = 1 + min(np.argmax(row) for row in (signals != self.state[:ni])[changed])
+        self.state[:ni] = signals
+        if start >= self.imax:
+            return
+        mask = self.engine.downstream(np.flatnonzero(changed))
+        noise = self.noise(sigma)
+        if noise is not None:
+            noise = noise[mask]
+        self.engine.restrict(mask).run(self.imax, sigma, noise=noise, out=self.state, start=start)
@@ -0,0 +1,153 @@
+import numpy as np
+
+from assign import combinations
+
+# Steady states of a circuit for constant inputs, without time integration
+#
+# A gate stops changing when its production and decay balance:
+#   x = response * tau_decay / tau_emit
+# (clipped to [0, 1000] like the simulation). The steady states are the
+# fixed points of this map F over all gates, for every combination of the
+# inputs (0 or high).
+# - feed-forward circuits have a single fixed point, found by applying F
+#   once per layer: each application settles one more layer
+# - circuits with feedback (such as builders.latch) may have several,
+#   each combination runs Newton's method on F(x) - x from the initial
+#   state of the gates, from the middle of the gates in cycles and from
+#   their corners (each one at 0 or at its highest level
+#   ymax * tau_decay / tau_emit), saturated starts alone can miss the
+#   unstable fixed points (e.g. of ring oscillators). The
+#   distinct fixed points are kept and classified as stable or not by the
+#   eigenvalues of the Jacobian of the dynamics.
+# Jacobians are taken by finite differences, all gates being perturbed
+# at once as one batch of Engine.response.
+
+# F for states of shape (..., len(nodes)), returns (..., len(gates))
+def balance(engine, state):
+    return np.clip(engine.response(state) * engine.tau_decay / engine.tau_emit, 0, 1000)
+
+# Jacobian of F with respect to the gates, shape (batch, len(gates), len(gates))
+def jacobian(engine, state, h=1e-7):
+    ni = len(engine.inputs)
+    ng = len(engine.gates)
+    pert = np.repeat(state[:, np.newaxis], ng, axis=1)
+    pert[:, np.arange(ng), ni + np.arange(ng)] += h
+    jac = (balance(engine, pert) - balance(engine, state)[:, np.newaxis]) / h
+    return jac.transpose(0, 2, 1)
+
+# Number of layers of gates, each one reading only earlier layers
+def depth(engine):
+    ni = len(engine.inputs)
+    layer = np.zeros(len(engine.gates), dtype=int)
+    for (j, g) in enumerate(engine.gates):
+        layer[j] = 1 + max([layer[engine.row[id(i)] - ni] for i in g.inputs if engine.row[id(i)] >= ni], default=0)
+    return layer.max(initial=0)
+
+# Newton's method from the states x of shape (batch, len(gates)), the
+# inputs (batch, len(inputs)) are held constant
+# Returns the final states and whether each one converged.
+def newton(engine, inputs, x, tol=1e-9, iterations=50):
+    eye = np.eye(len(engine.gates))
+    state = np.concatenate([inputs, x], axis=1)
+    ni = len(engine.inputs)
+    for _ in range(iterations):
+        g = balance(engine, state) - state[:, ni:]
+        done = np.abs(g).max(axis=1, initial=0) < tol
+        if done.all():
+            break
+        jac = jacobian(engine, state) - eye
+        try:
+            step = np.linalg.solve(jac, -g[..., np.newaxis])[..., 0]
+        except np.linalg.LinAlgError:
+            step = (np.linalg.pinv(jac) @ -g[..., np.newaxis])[..., 0]
+        step[done] = 0
+        state[:, ni:] = np.clip(state[:, ni:] + step, 0, 1000)
+    g = balance(engine, state) - state[:, ni:]
+    return state[:, ni:], np.abs(g).max(axis=1, initial=0) < tol
+
+# Fixed points of every combination of the inputs
+# - combos: Boolean inputs, shape (n_combos, len(inputs))
+# - points: for each combination, the distinct fixed points found, of
+#   shape (n_points, len(gates)), with the stable ones first
+# - stable: for each combination, which of those points are stable
+class Steady:
+    def __init__(self, engine, combos, points, stable):
+        self.engine = engine
+        self.names = [g.name for g in engine.gates]
+        self.combos = combos
+        self.points = points
+        self.stable = stable
+
+    # Combinations with more than one stable state
+    def multistable(self):
+        return np.array([s.sum() > 1 for s in self.stable])
+
+    # Stable states of a combination, shape (n_stable, len(gates))
+    def states(self, c):
+        return self.points[c][self.stable[c]]
+
+    # Whether the stable states of each combination agree with the logic
+    # of the gates, every gate being read as on above threshold
+    def check(self, threshold=0.5):
+        ni = len(self.engine.inputs)
+        res = np.empty(len(self.combos), dtype=bool)
+        for (c, combo) in enumerate(self.combos):
+            bits = np.empty((len(self.states(c)), len(self.engine.nodes)), dtype=bool)
+            bits[:, :ni] = combo
+            bits[:, ni:] = self.states(c) > threshold
+            ok = len(bits) > 0
+            for (j, g) in enumerate(self.engine.gates):
+                ok &= (g.combinator.logic(*[bits[:, self.engine.row[id(i)]] for i in g.inputs]) == bits[:, ni + j]).all()
+            res[c] = ok
+        return res
+
+# Steady states of a circuit (or Engine) for all combinations of its
+# inputs, held at 0 or high (or for the given Boolean combos)
+# starts bounds the number of corners tried per combination in circuits
+# with feedback, decimals is the precision to which fixed points are
+# told apart.
+def solve(circuit, high=1, combos=None, tol=1e-9, iterations=50, starts=64, decimals=6):
+    engine = circuit.compile()
+    ni = len(engine.inputs)
+    ng = len(engine.gates)
+    combos = combinations(ni) if combos is None else np.asarray(combos, dtype=bool)
+    nc = len(combos)
+    inputs = combos * float(high)
+    if not engine.cycles:
+        state = np.empty((nc, len(engine.nodes)))
+        state[:, :ni] = inputs
+        state[:, ni:] = engine.initial
+        for _ in range(depth(engine)):
+            state[:, ni:] = balance(engine, state)
+        return Steady(engine, combos, list(state[:, np.newaxis, ni:]), [np.ones(1, dtype=bool)] * nc)
+
+    # starting points: the initial state, the middle then corners of the cycles
+    loop = np.array(sorted(engine.row[id(g)] - ni for cycle in engine.cycles for g in cycle))
+    top = engine.highest()
+    if 2 ** len(loop) <= starts:
+        corners = combinations(len(loop))
+    else:
+        corners = np.random.default_rng(0).random((starts, len(loop))) < 0.5
+    guesses = np.tile(engine.initial, (len(corners) + 2, 1))
+    guesses[1, loop] = top[loop] / 2
+    guesses[2:, loop] = np.where(corners, top[loop], 0)
+    ns = len(guesses)
+    x, ok = newton(engine, np.repeat(inputs, ns, axis=0), np.tile(guesses, (nc, 1)), tol, iterations)
+    x = x.reshape(nc, ns, ng)
+    ok = ok.reshape(nc, ns)
+    points = []
+    stable = []
+    for c in range(nc):
+        _, first = np.unique(np.round(x[c][ok[c]], decimals), axis=0, return_index=True)
+        found = x[c][ok[c]][np.sort(first)]
+        if len(found):
+            state = np.concatenate([np.tile(inputs[c], (len(found), 1)), found], axis=1)
+            # dynamics dx/dt = (F(x) - x) / tau_decay
+            jac = (jacobian(engine, state) - np.eye(ng)) / engine.tau_decay[:, np.newaxis]
+            s = np.linalg.eigvals(jac).real.max(axis=1) < 0
+        else:
+            s = np.zeros(0, dtype=bool)
+        order = np.argsort(~s, kind='stable')
+        points.append(found[order])
+        stable.append(s[order])
+    return Steady(engine, combos, points, stable)
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import zlib
+
+import numpy as np
+
+from circuit import Noise, dt
+from engine import signature
+from stream import Stream
+
+# Trajectories saved to disk while they are simulated
+# - path.npy: array of shape (len(names), imax), one row per kept node,
+#   read through a memory map so that slices by node and time only load
+#   the pages they cover
+# - path.json: names, imax, sigma, noise seed, signature of the gates and
+#   fingerprint of the input signals, number of steps saved (size), the
+#   full state of the circuit at step size - 1, from which a simulation
+#   can resume, and the checksum of the saved steps of the inputs that
+#   have no fingerprint
+# Steps beyond size are not meaningful.
+class Store:
+    def __init__(self, path, mode='r'):
+        self.path = path
+        with open(path + '.json') as f:
+            self.meta = json.load(f)
+        self.names = self.meta['names']
+        self.size = self.meta['size']
+        self.data = np.load(path + '.npy', mmap_mode=mode)
+
+    def create(path, meta):
+        meta = dict(meta, size=0, state=None)
+        np.lib.format.open_memmap(path + '.npy', mode='w+', shape=(len(meta['names']), meta['imax'])).flush()
+        Store.save(path, meta)
+        return Store(path, 'r+')
+
+    # The metadata is replaced atomically, so that an interrupted run
+    # resumes from the last chunk whose data was flushed
+    def save(path, meta):
+        with open(path + '.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(path + '.tmp', path + '.json')
+
+    # Mark the first size steps as saved, state being the full state of
+    # the circuit at step size - 1
+    def commit(self, size, state, checksum=0):
+        self.data.flush()
+        self.size = size
+        self.meta = dict(self.meta, size=size, state=[float(x) for x in state], checksum=checksum)
+        Store.save(self.path, self.meta)
+
+    def row(self, name):
+        return self.names.index(name)
+
+    # Saved steps of a node between start and stop
+    def trace(self, name, start=0, stop=None):
+        stop = self.size if stop is None else min(stop, self.size)
+        return self.data[self.row(name), start:stop]
+
+    # Slices by row and step of the saved steps, such as store[2, 1000:2000]
+    def __getitem__(self, key):
+        return self.data[:, :self.size][key]
+
+# Hash of the parameters of each input signal, the key of the signals
+# made by Input.signal, None for other signals
+def fingerprint(engine):
+    return [
+        None if getattr(i.ind, 'key', None) is None else hashlib.sha256(repr((i.ind.key, dt)).encode()).hexdigest()
+        for i in engine.inputs
+    ]
+
+# Checksum of signals of shape (len(inputs), n), step by step, continuing
+# the one of the previous steps
+def checksum(values, crc=0):
+    return zlib.crc32(np.ascontiguousarray(values.T).tobytes(), crc)
+
+# Checksum of the first size steps of some inputs, computed block steps
+# at a time
+def replay(engine, inputs, size, block=65536):
+    crc = 0
+    last = None
+    for start in range(0, size, block):
+        values = engine.signals(min(start + block, size), inputs=inputs, start=start, last=last)
+        crc = checksum(values, crc)
+        last = values[:, -1]
+    return crc
+
+# Simulate circuit with the compiled engine and stream its kept nodes
+# to the store at path, chunk steps at a time. A store left by an
+# interrupted run of the same circuit (same gates, input signals, imax,
+# sigma and noise seed) is resumed from its last saved chunk, any other
+# is overwritten. Input signals without fingerprint are recomputed up to
+# the saved steps to be compared.
+# Returns the store, opened for reading and writing.
+def record(circuit, imax, sigma, path, chunk=4096):
+    engine = circuit.compile()
+    keep = circuit.rows()
+    meta = {
+        'names': [engine.nodes[i].name for i in keep],
+        'imax': imax,
+        'sigma': sigma,
+        'seed': Noise.seed,
+        'signature': repr(signature(engine.nodes)),
+        'inputs': fingerprint(engine),
+    }
+    rows = [r for (r, f) in enumerate(meta['inputs']) if f is None]
+    unkeyed = [engine.inputs[r] for r in rows]
+    store = None
+    if os.path.exists(path + '.json') and os.path.exists(path + '.npy'):
+        store = Store(path, 'r+')
+        old = { k: store.meta.get(k) for k in meta }
+        if old != meta or store.data.shape != (len(keep), imax):
+            store = None
+        elif unkeyed and replay(engine, unkeyed, store.size) != store.meta.get('checksum'):
+            store = None
+    if store is None:
+        store = Store.create(path, meta)
+    state = store.meta['state'] if store.size else None
+    crc = store.meta.get('checksum', 0) if store.size else 0
+    steps = Stream(engine, sigma, chunk, keep, imax, start=store.size, state=state)
+    for block in steps:
+        store.data[:, store.size:steps.size] = block
+        if unkeyed:
+            crc = checksum(steps.signals[rows], crc)
+        store.commit(steps.size, steps.state, crc)
+    return store
@@ -0,0 +1,72 @@
+import numpy as np
+
+from circuit import Noise
+
+# Simulation of a compiled circuit that advances chunk steps at a time
+# Iterating yields the rows keep of each chunk, as arrays of shape
+# (len(keep), chunk) (the last one is shorter when imax is reached),
+# for ever when imax is None. Between chunks only the current state is
+# kept, plus the last history steps of the kept rows when history > 0,
+# so memory does not grow with the length of the run.
+# - size: number of steps simulated so far
+# - state: full state of the circuit (one value per node) at step size - 1
+# - signals: values of the inputs over the steps of the last chunk
+# - a run can be continued from step start > 0 given its state there
+# Steps and noise are the same as for Engine.run.
+class Stream:
+    def __init__(self, engine, sigma, chunk, keep, imax=None, history=0, start=0, state=None):
+        self.engine = engine
+        self.sigma = sigma
+        self.chunk = chunk
+        self.keep = np.asarray(keep, dtype=int)
+        self.imax = imax
+        self.names = [engine.nodes[i].name for i in self.keep]
+        self.size = start
+        self.state = None if state is None else np.array(state, dtype=float)
+        self.signals = None
+        self.noise = Noise.stream(engine.noise_keys, chunk, start) if sigma != 0 else None
+        # ring buffer, step t is in column t % history
+        self.history = np.empty((len(self.keep), history))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        engine = self.engine
+        ni = len(engine.inputs)
+        start = self.size
+        if self.imax is not None and start >= self.imax:
+            raise StopIteration
+        stop = start + self.chunk if self.imax is None else min(start + self.chunk, self.imax)
+        noise = next(self.noise)[np.newaxis, :, :stop - start] if self.noise is not None else None
+        out = np.empty((1, len(self.keep), stop - start))
+        if start == 0:
+            signals = engine.signals(stop)[np.newaxis]
+            cur = np.empty((1, len(engine.nodes)))
+            cur[:, :ni] = signals[:, :, 0]
+            cur[:, ni:] = engine.initial
+            out[:, :, 0] = cur[:, self.keep]
+            engine.advance(cur, signals[:, :, 1:], self.sigma,
+                           None if noise is None else noise[:, :, 1:], out[:, :, 1:], self.keep)
+        else:
+            cur = self.state[np.newaxis].copy()
+            signals = engine.signals(stop, start=start, last=cur[0, :ni])[np.newaxis]
+            engine.advance(cur, signals, self.sigma, noise, out, self.keep)
+        self.state = cur[0]
+        self.signals = signals[0]
+        self.size = stop
+        self.remember(out[0])
+        return out[0]
+
+    def remember(self, block):
+        n = self.history.shape[1]
+        if n == 0:
+            return
+        block = block[:, -n:]
+        cols = np.arange(self.size - block.shape[1], self.size) % n
+        self.history[:, cols] = block
+
+    # The last steps in the ring buffer, oldest first
+    def recent(self):
+        n = min(self.size, self.history.shape[1])
+        return self.history[:, np.arange(self.size - n, self.size) % self.history.shape[1]]
@@ -0,0 +1,60 @@
+import itertools
+
+import numpy as np
+
+from engine import Engine, layout, signature
+
+# Cartesian product of the parameter axes, as one flat array per parameter
+def grid(**axes):
+    names = list(axes.keys())
+    combos = list(itertools.product(*[np.atleast_1d(axes[k]) for k in names]))
+    return { k: np.array([c[i] for c in combos]) for (i, k) in enumerate(names) }
+
+# Result of a sweep
+# - params: value of each swept parameter for every variant
+# - names: name of the node on each row
+# - traces: array of shape (n_variants, n_nodes, imax)
+class Sweep:
+    def __init__(self, params, names, traces):
+        self.params = params
+        self.names = names
+        self.traces = traces
+
+    # All variants of a single node
+    def trace(self, name):
+        return self.traces[:, self.names.index(name)]
+
+# Simulate every combination of the swept parameters in a single batch
+# - builder is a circuit constructor such as builders.xor, it gets called once per
+#   variant with imax=0 to obtain the input signals without running it
+# - keyword arguments given as lists or arrays are swept, the others are
+#   passed unchanged; sigma can be swept like any other parameter
+# All variants must only differ by their inputs.
+# method='filter' uses Engine.filter for noise-free feed-forward circuits.
+def sweep(builder, *, imax, sigma=0, method='euler', **kwargs):
+    axes = { k: v for (k, v) in kwargs.items() if np.ndim(v) > 0 }
+    fixed = { k: v for (k, v) in kwargs.items() if np.ndim(v) == 0 }
+    params = grid(sigma=sigma, **axes)
+    nv = len(params["sigma"])
+    engine = None
+    signals = None
+    for v in range(nv):
+        args = { k: params[k][v] for k in axes }
+        circuit = builder(imax=0, sigma=0, **fixed, **args)
+        if engine is None:
+            engine = Engine(circuit)
+            sig = signature(engine.nodes)
+            signals = np.empty((nv, len(engine.inputs), imax))
+        nodes = layout(circuit.gates)
+        if signature(nodes) != sig:
+            raise ValueError("sweep variants must only differ by their inputs, {} changes the gates".format(args))
+        signals[v] = engine.signals(imax, nodes[:len(engine.inputs)])
+    if method == 'filter':
+        if np.any(params["sigma"] != 0):
+            raise ValueError("method filter does not support noise")
+        traces = engine.filter(imax, signals)
+    else:
+        traces = engine.run(imax, params["sigma"], signals)
+    if np.ndim(sigma) == 0:
+        del params["sigma"]
+    return Sweep(params, [n.name for n in engine.nodes], traces)